@@ -1,30 +1,74 @@
 import os
+import re
+import sys
+import time
 import logging
 import asyncio
+import collections
 import tkinter as tk
-import message_analyser.retriever.telegram as tlg
+import tkinter.font as tkfont
 import message_analyser.storage as storage
-from message_analyser import analyser
-from tkinter import filedialog
+from tkinter import filedialog, ttk
 
+frame_time = 0.05  # the longest time (seconds) between two GUI updates.
+min_sleep = 0.001
+# An update which comes later than this (seconds) means the event loop is busy (timers can't be more precise).
+busy_lateness = 2 * max(min_sleep, time.get_clock_info("monotonic").resolution)
+file_label_prefix = "File :          "  # 15 characters long, like the other labels.
 
-async def start_gui(loop):
+# Tk can't display characters starting from U+FFFF (emojis etc.).
+_TK_UNSUPPORTED_CHARS_RE = re.compile("[\uffff-\U0010ffff]")
+
+
+try:
+    # libuv-based event loops are used if installed (optional), otherwise asyncio's default one.
+    if sys.platform == "win32":
+        import winloop as uvloop
+    else:
+        import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
+
+async def start_gui(loop=None):
+    if loop is None:
+        loop = asyncio.get_running_loop()
     app = MessageAnalyserGUI(tk.Tk(), loop)
-    try:
-        while True:
-            # We want to update the application but get back
-            # to asyncio's event loop. For this we sleep a
-            # short time so the event loop can run.
-            #
-            # https://www.reddit.com/r/Python/comments/33ecpl
-            # print("UPDATED!")
+    closed = loop.create_future()
+    update_time = 0.  # an exponential moving average of app.update() duration
+    idle_sleep = min_sleep
+    due = loop.time()  # when the next update was scheduled for
+
+    def update():
+        # We want to update the application but get back
+        # to asyncio's event loop. For this the update is
+        # rescheduled as a plain callback, so the event loop can run.
+        #
+        # https://www.reddit.com/r/Python/comments/33ecpl
+        # print("UPDATED!")
+        nonlocal update_time, idle_sleep, due
+        late = loop.time() - due
+        start = time.perf_counter()
+        try:
             app.update()
-            await asyncio.sleep(0.05)
-    except KeyboardInterrupt:
-        pass
-    except tk.TclError as e:
-        if "application has been destroyed" not in e.args[0]:
-            raise
+        except KeyboardInterrupt:
+            return closed.set_result(None)
+        except tk.TclError as e:
+            if "application has been destroyed" not in e.args[0]:
+                return closed.set_exception(e)
+            return closed.set_result(None)
+        update_time += (time.perf_counter() - start - update_time) * 0.2
+        if late > busy_lateness:  # other callbacks have delayed the update, so the loop is busy: update often.
+            idle_sleep = min_sleep
+        # back off exponentially while idle, but keep the frame rate at 1 / frame_time.
+        delay = max(0., min(idle_sleep, frame_time - update_time))
+        due = loop.time() + delay
+        loop.call_later(delay, update)
+        idle_sleep = min(idle_sleep * 2, frame_time)
+
+    loop.call_soon(update)
+    await closed
 
 
 class LoggingToGUI(logging.Handler):
@@ -32,20 +76,33 @@ class LoggingToGUI(logging.Handler):
 
     # https://stackoverflow.com/a/18194597
 
-    def __init__(self, console):
+    def __init__(self, console, max_buffered=1000):
         logging.Handler.__init__(self)
 
         self.console = console  # Any text widget, you can use the class above or not
+        # Only the newest messages are kept if the widget can't keep up with logging.
+        self._buf = collections.deque(maxlen=max_buffered)
+        self._pending = False
 
     def emit(self, message):  # Overwrites the default handler's emit method
         formatted_message = self.format(message)  # You can change the format here
 
+        # The widget is not touched here: buffered messages are inserted at once when Tk is idle.
+        self._buf.append(formatted_message)
+        if not self._pending:
+            self._pending = True
+            self.console.after_idle(self._flush)
+        # print(message)  # You can just print to STDout in your overriden emit no need for black magic
+
+    def _flush(self):
+        blob = "".join(self._buf)
+        self._buf.clear()
+        self._pending = False
         # Disabling states so no user can write in it
         self.console.configure(state=tk.NORMAL)
-        self.console.insert(tk.END, formatted_message)  # Inserting the logger message in the widget
+        self.console.insert(tk.END, blob)  # Inserting the logger messages in the widget
         self.console.configure(state=tk.DISABLED)
         self.console.see(tk.END)
-        # print(message)  # You can just print to STDout in your overriden emit no need for black magic
 
 
 class MessageAnalyserGUI(tk.Frame):
@@ -75,6 +132,10 @@ class MessageAnalyserGUI(tk.Frame):
                 "your_name": (str) Your name.,
                 "target_name": (str) Target's name.
             }
+        saved_session_params (tuple): Session parameters stored in config file (see storage.get_session_params).
+        saved_telegram_secrets (tuple): Telegram secrets stored in config file (see storage.get_telegram_secrets).
+        frames (dict): Built frames by their names (only one of them is shown at a time).
+        var_* (tk.Variable): Variables of the check boxes, file labels and dialog selection (shared by rebuilt frames).
     """
 
     def __init__(self, parent, loop, *args, **kwargs):
@@ -86,116 +147,156 @@ class MessageAnalyserGUI(tk.Frame):
         self.parent.geometry(f"{self.x}x{self.y}")
         self.parent.grid_columnconfigure(3, weight=8)
         self.parent.resizable(False, False)
+        # Font objects are shared by all widgets, so Tk resolves each font description only once.
         self.default_font_name = "Courier"
-        self.default_font = (self.default_font_name, 11)
+        self.default_font = tkfont.Font(family=self.default_font_name, size=11)
+        self.header_font = tkfont.Font(family=self.default_font_name, size=20)
+        self.sub_header_font = tkfont.Font(family=self.default_font_name, size=15)
         self.button_background = "#ccccff"
         self.aio_loop = loop
 
         self.session_params = dict()
+        # Tk variables of the widgets live as long as the GUI does.
+        self.var_from_tg = tk.BooleanVar()
+        self.var_from_vk = tk.BooleanVar()
+        self.var_plot_words = tk.BooleanVar()
+        self.var_vkopt_path = tk.StringVar(value=file_label_prefix)
+        self.var_words_path = tk.StringVar(value=file_label_prefix)
+        self.var_dialog = tk.StringVar()
+        # Stored parameters are read once; they are only changed on disk by this GUI.
+        self.saved_session_params = storage.get_session_params()
+        self.saved_telegram_secrets = storage.get_telegram_secrets()
+        # Keeps a connected Telegram client between sign-in attempts and the dialogs retrieval.
+        self._tlg_state = dict()
+
+        # Frames are built once and then hidden/shown, so going back and forth doesn't recreate widgets.
+        self.frames = dict()
+        self.continue_handlers = dict()
+        self.shown_frame = None
+        self.parent.bind('<Return>', lambda _: self.continue_handlers[self.shown_frame]())
 
         self.raise_start_frame()
 
+    def _show(self, name):
+        """Hides the shown frame and shows a (built) frame with the given name instead."""
+        if self.shown_frame is not None:
+            self.frames[self.shown_frame].pack_forget()
+        self.frames[name].pack(expand=True, fill="both")
+        self.shown_frame = name
+
     def __set_file_path(self, label_text, file):
         """Stores file path in session parameters and changes the corresponding label text."""
-        self.session_params[file] = filedialog.askopenfilename(title=file, filetypes=[("Text files", ".txt")])
-        label_text.set("File :          " + os.path.split(self.session_params[file])[-1])
+        # The dialog is modal and has to run in Tk's thread, so the event loop waits for it.
+        # It's fine as long as files are chosen before any Telegram requests are sent.
+        file_path = filedialog.askopenfilename(title=file, filetypes=[("Text files", ".txt")])
+        if not file_path:  # the dialog was cancelled
+            return
+        self.session_params[file] = file_path
+        label_text.set(file_label_prefix + os.path.basename(self.session_params[file]))
 
     def raise_start_frame(self):
         """Chooses base analyser parameters (do or do not analyse Telegram messages/vk.com messages/words)."""
-        labels_frame = tk.Frame()
+        if "start" not in self.frames:
+            self._build_start_frame()
+        self._show("start")
+
+    def _build_start_frame(self):
+        container = tk.Frame(self.parent)
+
+        labels_frame = tk.Frame(container)
         labels_frame.pack(side=tk.TOP)
 
         start_label = tk.Label(labels_frame, text="Hi!\nLet's get started",
-                               height=2, width=35, font=(self.default_font_name, 20))
+                               height=2, width=35, font=self.header_font)
         start_label.pack()
 
         start_label = tk.Label(labels_frame, text="What do You want to analyse?",
-                               height=2, width=35, font=(self.default_font_name, 15))
+                               height=2, width=35, font=self.sub_header_font)
         start_label.pack()
 
-        check_boxes_frame = tk.Frame()
+        check_boxes_frame = tk.Frame(container)
         check_boxes_frame.pack(anchor=tk.W)
-        from_telegram = tk.BooleanVar()
-        telegram_check_button = tk.Checkbutton(check_boxes_frame, text="Messages from Telegram", variable=from_telegram,
+        telegram_check_button = tk.Checkbutton(check_boxes_frame, text="Messages from Telegram", variable=self.var_from_tg,
                                                font=self.default_font)
         telegram_check_button.pack(anchor=tk.W)
-        if "from_telegram" in self.session_params and self.session_params["from_telegram"]:
-            telegram_check_button.select()
 
-        from_vk = tk.BooleanVar()
-        vk_check_button = tk.Checkbutton(check_boxes_frame, text="Messages from vkOpt text file", variable=from_vk,
+        vk_check_button = tk.Checkbutton(check_boxes_frame, text="Messages from vkOpt text file", variable=self.var_from_vk,
                                          font=self.default_font)
         vk_check_button.pack(anchor=tk.W)
-        if "from_vk" in self.session_params and self.session_params["from_vk"]:
-            vk_check_button.select()
 
-        plot_words = tk.BooleanVar()
-        words_check_button = tk.Checkbutton(check_boxes_frame, text="Add file with words", variable=plot_words,
+        words_check_button = tk.Checkbutton(check_boxes_frame, text="Add file with words", variable=self.var_plot_words,
                                             font=self.default_font)
         words_check_button.pack(anchor=tk.W)
-        if "plot_words" in self.session_params and self.session_params["plot_words"]:
-            words_check_button.select()
 
         def set_data_and_continue():
-            if from_vk.get() or from_telegram.get():
-                self.session_params["plot_words"] = plot_words.get()
-                self.session_params["from_vk"] = from_vk.get()
-                self.session_params["from_telegram"] = from_telegram.get()
-                bottom_frame.destroy()
-                labels_frame.destroy()
-                check_boxes_frame.destroy()
+            if self.var_from_vk.get() or self.var_from_tg.get():
+                self.session_params["plot_words"] = self.var_plot_words.get()
+                self.session_params["from_vk"] = self.var_from_vk.get()
+                self.session_params["from_telegram"] = self.var_from_tg.get()
                 return self.raise_files_frame()
             telegram_check_button.config(fg="red")
             vk_check_button.config(fg="red")
 
-        bottom_frame = tk.Frame()
+        bottom_frame = tk.Frame(container)
         bottom_frame.pack(side=tk.BOTTOM)
         continue_button = tk.Button(bottom_frame, text="Continue", command=set_data_and_continue,
                                     padx=35, background=self.button_background, font=self.default_font)
         continue_button.pack(side=tk.BOTTOM)
-        self.parent.bind('<Return>', lambda _: set_data_and_continue())
+
+        self.frames["start"] = container
+        self.continue_handlers["start"] = set_data_and_continue
 
     def raise_files_frame(self):
         """Chooses a file with words and a file with VkOpt messages; assigns names."""
-        table_frame = tk.Frame()
+        if "files" not in self.frames:
+            self._build_files_frame()
+        # Only rows which are needed for the chosen analyser parameters are shown.
+        for widget in self.vkopt_widgets:
+            if self.session_params["from_vk"]:
+                widget.grid()
+            else:
+                widget.grid_remove()
+        for widget in self.words_widgets:
+            if self.session_params["plot_words"]:
+                widget.grid()
+            else:
+                widget.grid_remove()
+        self._show("files")
+
+    def _build_files_frame(self):
+        container = tk.Frame(self.parent)
+        table_frame = tk.Frame(container)
         table_frame.pack(expand=True, fill="both")
 
-        cur_row = 0
-        if self.session_params["from_vk"]:
-            cur_row += 1
-            vkopt_label = tk.Label(table_frame, text="Choose path to:", height=2, font=self.default_font)
-            vkopt_label.grid(row=cur_row, column=1, sticky=tk.W)
-
-            vkopt_button = tk.Button(table_frame, text="vkOpt file",
-                                     command=lambda: self.__set_file_path(vkopt_filename_label_text, "vkopt_file"),
-                                     font=self.default_font)
-            vkopt_button.grid(row=cur_row, column=2, sticky=tk.W)
-
-            cur_row += 1
-            vkopt_filename_label_text = tk.StringVar()
-            vkopt_filename_label_text.set("File :          ")
-            vkopt_filename_label = tk.Label(table_frame, textvariable=vkopt_filename_label_text, height=2,
-                                            font=self.default_font)
-            vkopt_filename_label.grid(row=cur_row, column=1, sticky=tk.W, columnspan=30)
-
-        if self.session_params["plot_words"]:
-            cur_row += 1
-            words_label = tk.Label(table_frame, text="Choose path to:", height=2, font=self.default_font)
-            words_label.grid(row=cur_row, column=1, sticky=tk.W)
-
-            words_button = tk.Button(table_frame, text="words file",
-                                     command=lambda: self.__set_file_path(words_filename_label_text, "words_file"),
-                                     font=self.default_font)
-            words_button.grid(row=cur_row, column=2, sticky=tk.W)
-
-            cur_row += 1
-            words_filename_label_text = tk.StringVar()
-            words_filename_label_text.set("File :          ")
-            words_filename_label = tk.Label(table_frame, textvariable=words_filename_label_text, height=2,
-                                            font=self.default_font)
-            words_filename_label.grid(row=cur_row, column=1, sticky=tk.W, columnspan=30)
+        cur_row = 1
+        vkopt_label = tk.Label(table_frame, text="Choose path to:", height=2, font=self.default_font)
+        vkopt_label.grid(row=cur_row, column=1, sticky=tk.W)
+
+        vkopt_button = tk.Button(table_frame, text="vkOpt file",
+                                 command=lambda: self.__set_file_path(self.var_vkopt_path, "vkopt_file"),
+                                 font=self.default_font)
+        vkopt_button.grid(row=cur_row, column=2, sticky=tk.W)
+
+        cur_row += 1
+        vkopt_filename_label = tk.Label(table_frame, textvariable=self.var_vkopt_path, height=2,
+                                        font=self.default_font)
+        vkopt_filename_label.grid(row=cur_row, column=1, sticky=tk.W, columnspan=30)
+
+        cur_row += 1
+        words_label = tk.Label(table_frame, text="Choose path to:", height=2, font=self.default_font)
+        words_label.grid(row=cur_row, column=1, sticky=tk.W)
 
-        _, _, _, your_name, target_name = storage.get_session_params()
+        words_button = tk.Button(table_frame, text="words file",
+                                 command=lambda: self.__set_file_path(self.var_words_path, "words_file"),
+                                 font=self.default_font)
+        words_button.grid(row=cur_row, column=2, sticky=tk.W)
+
+        cur_row += 1
+        words_filename_label = tk.Label(table_frame, textvariable=self.var_words_path, height=2,
+                                        font=self.default_font)
+        words_filename_label.grid(row=cur_row, column=1, sticky=tk.W, columnspan=30)
+
+        _, _, _, your_name, target_name = self.saved_session_params
 
         cur_row += 1
         your_name_label = tk.Label(table_frame, text="Your name:     ", height=2, font=self.default_font)
@@ -213,19 +314,22 @@ class MessageAnalyserGUI(tk.Frame):
         target_name_dir.insert(tk.END, target_name)
         target_name_dir.grid(row=cur_row, column=2)
 
-        if self.session_params["from_vk"]:
-            cur_row += 1
-            names_label = tk.Label(table_frame, text=("Please be sure these names are equal to the names in the \n"
-                                                      "vkOpt file. Otherwise vkOpt file will not be read correctly."),
-                                   fg="red", height=2, font=self.default_font, justify="left")
-            names_label.grid(row=cur_row, column=1, sticky=tk.W, columnspan=30)
+        cur_row += 1
+        names_label = tk.Label(table_frame, text=("Please be sure these names are equal to the names in the \n"
+                                                  "vkOpt file. Otherwise vkOpt file will not be read correctly."),
+                               fg="red", height=2, font=self.default_font, justify="left")
+        names_label.grid(row=cur_row, column=1, sticky=tk.W, columnspan=30)
+
+        self.vkopt_widgets = [vkopt_label, vkopt_button, vkopt_filename_label, names_label]
+        self.words_widgets = [words_label, words_button, words_filename_label]
 
         def set_data_and_continue():
             your_name_label.config(fg="black")
             target_name_label.config(fg="black")
-            if your_name_dir.get().isspace() or not your_name_dir.get():
+            your_name, target_name = your_name_dir.get(), target_name_dir.get()
+            if not your_name or your_name.isspace():
                 return your_name_label.config(fg="red")
-            if target_name_dir.get().isspace() or not target_name_dir.get():
+            if not target_name or target_name.isspace():
                 return target_name_label.config(fg="red")
 
             if self.session_params["from_vk"]:
@@ -238,38 +342,38 @@ class MessageAnalyserGUI(tk.Frame):
                     return words_filename_label.config(fg="red")
                 words_filename_label.config(fg="black")
 
-            self.session_params["your_name"] = your_name_dir.get()
-            self.session_params["target_name"] = target_name_dir.get()
-            bottom_frame.destroy()
-            table_frame.destroy()
+            self.session_params["your_name"] = your_name
+            self.session_params["target_name"] = target_name
             if self.session_params["from_telegram"]:
                 return self.raise_telegram_auth_frame()
             self.raise_finish_frame()
 
-        def raise_start_frame():
-            bottom_frame.destroy()
-            table_frame.destroy()
-            self.raise_start_frame()
-
-        bottom_frame = tk.Frame()
+        bottom_frame = tk.Frame(container)
         bottom_frame.pack(side=tk.BOTTOM)
-        back_button = tk.Button(bottom_frame, text="Back", command=raise_start_frame,
-                                    padx=35, background=self.button_background, font=self.default_font)
+        back_button = tk.Button(bottom_frame, text="Back", command=self.raise_start_frame,
+                                padx=35, background=self.button_background, font=self.default_font)
         back_button.pack(side=tk.LEFT)
 
         continue_button = tk.Button(bottom_frame, text="Continue", command=set_data_and_continue,
                                     padx=35, background=self.button_background, font=self.default_font)
         continue_button.pack(side=tk.RIGHT)
-        self.parent.bind('<Return>', lambda _: set_data_and_continue())
+
+        self.frames["files"] = container
+        self.continue_handlers["files"] = set_data_and_continue
 
     def raise_telegram_auth_frame(self):
         """Makes an initial sign-in into Telegram client."""
-        table_frame = tk.Frame()
-        table_frame.pack(expand=True, fill="both")
-
         assert self.session_params["from_telegram"]
+        if "telegram_auth" not in self.frames:
+            self._build_telegram_auth_frame()
+        self._show("telegram_auth")
+
+    def _build_telegram_auth_frame(self):
+        container = tk.Frame(self.parent)
+        table_frame = tk.Frame(container)
+        table_frame.pack(expand=True, fill="both")
 
-        api_id, api_hash, phone_number, _ = storage.get_telegram_secrets()
+        api_id, api_hash, phone_number, _ = self.saved_telegram_secrets
         
         # A text in labels should be 15 characters long in order to not shift entries. 
         # Should make them more adaptive some day.
@@ -316,17 +420,18 @@ class MessageAnalyserGUI(tk.Frame):
         message_label.grid(row=6, column=1, sticky=tk.W, columnspan=2)
 
         async def try_sign_in_and_continue():
+            import message_analyser.retriever.telegram as tlg  # Telethon is imported only when it's needed.
             res = await tlg.get_sign_in_results(api_id_dir.get(),
                                                 api_hash_dir.get(),
                                                 code_dir.get(),
                                                 phone_number_dir.get(),
                                                 password_dir.get(),
                                                 self.session_params["your_name"],
-                                                loop=self.aio_loop)
-            try:
-                api_id_label.config(fg="black")
-            except tk.TclError:  # too fast "continue" button clicks?
+                                                loop=self.aio_loop,
+                                                client_cache=self._tlg_state)
+            if self.shown_frame != "telegram_auth":  # too fast "continue" button clicks?
                 return
+            api_id_label.config(fg="black")
             api_hash_label.config(fg="black")
             phone_number_label.config(fg="black")
             code_label.config(fg="black")
@@ -357,55 +462,74 @@ class MessageAnalyserGUI(tk.Frame):
             assert res == "success"
             storage.store_telegram_secrets(api_id_dir.get(), api_hash_dir.get(), phone_number_dir.get(),
                                            session_name=self.session_params["your_name"])
-            bottom_frame.destroy()
-            table_frame.destroy()
+            self.saved_telegram_secrets = (api_id_dir.get(), api_hash_dir.get(), phone_number_dir.get(),
+                                           self.session_params["your_name"])
             self.aio_loop.create_task(self.raise_dialogs_select_frame())
 
-        bottom_frame = tk.Frame()
+        def sign_in_and_continue():
+            self.aio_loop.create_task(try_sign_in_and_continue())
+
+        bottom_frame = tk.Frame(container)
         bottom_frame.pack(side=tk.BOTTOM)
         continue_button = tk.Button(bottom_frame, text="Continue",
-                                    command=lambda: self.aio_loop.create_task(try_sign_in_and_continue()),
+                                    command=sign_in_and_continue,
                                     padx=35, background=self.button_background,
                                     font=self.default_font)
         continue_button.pack(side=tk.BOTTOM)
-        self.parent.bind('<Return>', lambda _: self.aio_loop.create_task(try_sign_in_and_continue()))
+
+        self.frames["telegram_auth"] = container
+        self.continue_handlers["telegram_auth"] = sign_in_and_continue
 
     async def raise_dialogs_select_frame(self):
         """Chooses a Telegram dialogue to analyse messages from."""
-        table_frame = tk.Frame()
+        container = tk.Frame(self.parent)
+        table_frame = tk.Frame(container)
         table_frame.pack(expand=True, fill="both")
+        self.frames["dialogs_select"] = container
+        self.continue_handlers["dialogs_select"] = lambda: None  # there is nothing to select yet
+        self._show("dialogs_select")
 
         dialog_select_label = tk.Label(table_frame, text="Please select a dialog You want to analyse messages from :",
                                        height=2, font=self.default_font)
         dialog_select_label.grid(row=1, column=1, sticky=tk.W)
 
-        dialogs = await tlg.get_str_dialogs(loop=self.aio_loop)
-        for i in range(len(dialogs)):
-            dialogs[i] = ''.join(char for char in dialogs[i] if char < u"\uffff")
+        import message_analyser.retriever.telegram as tlg
+        dialogs = [_TK_UNSUPPORTED_CHARS_RE.sub("", dialog) for dialog in
+                   await tlg.get_str_dialogs(client=self._tlg_state.get("client"), loop=self.aio_loop)]
 
-        dialog_variable = tk.StringVar()
-        dialog_variable.set(dialogs[0])  # default value
-        dialog_selection_menu = tk.OptionMenu(table_frame, dialog_variable, *dialogs)
+        self.var_dialog.set(dialogs[0])  # default value
+        # Combobox fills its list only when it's dropped down, unlike OptionMenu with a menu entry per dialog.
+        dialog_selection_menu = ttk.Combobox(table_frame, textvariable=self.var_dialog, values=dialogs,
+                                             state="readonly", width=50, font=self.default_font)
         dialog_selection_menu.grid(row=2, column=1, sticky=tk.W)
 
-        def select_dialog_and_continue():
-            self.session_params["dialogue"] = dialog_variable.get()
-            bottom_frame.destroy()
-            table_frame.destroy()
+        async def release_client_and_continue():
+            # The analyser opens its own client with the same .session file.
+            await tlg.disconnect_cached_client(self._tlg_state)
             self.raise_finish_frame()
 
-        bottom_frame = tk.Frame()
+        def select_dialog_and_continue():
+            if "dialogue" in self.session_params:  # already selected, the client is being released
+                return
+            self.session_params["dialogue"] = self.var_dialog.get()
+            self.aio_loop.create_task(release_client_and_continue())
+
+        bottom_frame = tk.Frame(container)
         bottom_frame.pack(side=tk.BOTTOM)
         continue_button = tk.Button(bottom_frame, text="Continue",
                                     command=select_dialog_and_continue, padx=35, background=self.button_background,
                                     font=self.default_font)
         continue_button.pack(side=tk.BOTTOM)
-        self.parent.bind('<Return>', lambda _: select_dialog_and_continue())
+        self.continue_handlers["dialogs_select"] = select_dialog_and_continue
 
     def raise_finish_frame(self):
         """Shows analysis process and results."""
-        table_frame = tk.Frame()
+        container = tk.Frame(self.parent)
+        table_frame = tk.Frame(container)
         table_frame.pack(expand=True, fill="both")
+        self.frames["finish"] = container
+        self.continue_handlers["finish"] = lambda: None
+        self._show("finish")
 
         finish_label = tk.Label(table_frame,
                                 text=("Plots and other data will be saved in a 'results' folder.\n"
@@ -422,13 +546,9 @@ class MessageAnalyserGUI(tk.Frame):
 
     def finalise(self):
         storage.store_session_params(self.session_params)
+        from message_analyser import analyser  # matplotlib, seaborn etc. are imported only when they are needed.
         self.aio_loop.create_task(analyser.retrieve_and_analyse(self.aio_loop))
 
 
 if __name__ == "__main__":
-    aio_loop = asyncio.get_event_loop()
-    try:
-        aio_loop.run_until_complete(start_gui(aio_loop))
-    finally:
-        if not aio_loop.is_closed():
-            aio_loop.close()
+    asyncio.run(start_gui())
@@ -1,15 +1,22 @@
 import os
+import csv
 import asyncio
 import datetime
+import itertools
+import numpy as np
 import message_analyser.plotter as plt
 import message_analyser.storage as storage
 import message_analyser.retriever.vkOpt as vkOpt
 import message_analyser.structure_tools as stools
 import message_analyser.retriever.telegram as tlg
-from message_analyser.misc import log_line, delay
+from operator import itemgetter
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from message_analyser.misc import log_line
 
 
-async def save_scalar_info(msgs, your_name, target_name, dir_path):
+async def save_scalar_info(msgs, your_name, target_name, dir_path, columns=None):
     """Saves scalar information about messages into a file. Additionally prints all the info to console.
 
     Args:
@@ -17,161 +24,226 @@ async def save_scalar_info(msgs, your_name, target_name, dir_path):
         your_name (str): Your name.
         target_name (str): Target's name.
         dir_path (str): A path to the file to store info in.
+        columns (dict, optional): msgs as numpy arrays (see structure_tools.get_columns), are made here if not given.
     """
-    with open(dir_path + "/scalar_info.csv", 'w', encoding="utf-8") as fp:
-        day_messages = stools.get_messages_per_day(msgs)
+    if columns is None:
+        columns = stools.get_columns(msgs, target_name)
+    with open(dir_path + "/scalar_info.csv", 'w', encoding="utf-8", newline="") as fp:
+        writer = csv.writer(fp, lineterminator="\n")  # quotes values with commas (e.g. "2 days, 3:00:00")
+        day_sizes = stools.get_messages_per_day_countered(msgs, columns["date"])
 
-        print_func = log_line
+        report = []  # lines are logged all at once
 
-        fp.write(f"Start date:,{msgs[0].date}\n")
-        print_func(f"{'Start date:'.ljust(25)}{msgs[0].date}")
+        writer.writerow(["Start date:", msgs[0].date])
+        report.append(f"{'Start date:'.ljust(25)}{msgs[0].date}")
 
-        fp.write(f"Duration:,{str(msgs[-1].date - msgs[0].date).replace(',',' ')}\n")
-        print_func(f"{'Duration:'.ljust(25)}{msgs[-1].date - msgs[0].date}")
+        writer.writerow(["Duration:", msgs[-1].date - msgs[0].date])
+        report.append(f"{'Duration:'.ljust(25)}{msgs[-1].date - msgs[0].date}")
 
-        empty_days_num = len([day for day in day_messages if not day_messages[day]])
-        fp.write(f"Days without messages:,{empty_days_num},\n")
-        print_func(f"{'Days without messages:'.ljust(25)}{empty_days_num}")
+        empty_days_num = sum(1 for size in day_sizes.values() if not size)
+        writer.writerow(["Days without messages:", empty_days_num, ""])
+        report.append(f"{'Days without messages:'.ljust(25)}{empty_days_num}")
 
-        most_active = max(day_messages, key=lambda day: len(day_messages[day]))
-        fp.write(f"Most active day:,{most_active} : {len(day_messages[most_active])} messages\n")
-        print_func(f"{'Most active day:'.ljust(25)}{most_active} : {len(day_messages[most_active])} messages")
+        most_active, most_active_size = max(day_sizes.items(), key=itemgetter(1))
+        writer.writerow(["Most active day:", f"{most_active} : {most_active_size} messages"])
+        report.append(f"{'Most active day:'.ljust(25)}{most_active} : {most_active_size} messages")
 
-        average = len(msgs) / len(day_messages)
-        fp.write(f"Average messages per day:,{average:.2f} messages\n")
-        print_func(f"{'Average messages per day:'.ljust(25)}{average:.2f} messages")
+        average = len(msgs) / len(day_sizes)
+        writer.writerow(["Average messages per day:", f"{average:.2f} messages"])
+        report.append(f"{'Average messages per day:'.ljust(25)}{average:.2f} messages")
 
-        max_delta, start_pause, end_pause = stools.get_longest_pause(msgs)
-        fp.write(f"Longest pause:,{str(max_delta).replace(',',' ')} From {start_pause} to {end_pause}\n")
-        print_func(f"{'Longest pause:'.ljust(25)}{max_delta} From {start_pause} to {end_pause}")
+        max_delta, start_pause, end_pause = stools.get_longest_pause(msgs, columns["date"])
+        writer.writerow(["Longest pause:", f"{max_delta} From {start_pause} to {end_pause}"])
+        report.append(f"{'Longest pause:'.ljust(25)}{max_delta} From {start_pause} to {end_pause}")
 
-        fp.write(f"\nINFO,TOTAL,{your_name},{target_name}\n")
-        print_func(f"{'INFO'.ljust(20)}{'TOTAL'.ljust(15)}{your_name:<15s}{target_name:<15s}")
+        writer.writerow([])
+        writer.writerow(["INFO", "TOTAL", your_name, target_name])
+        report.append(f"{'INFO'.ljust(20)}{'TOTAL'.ljust(15)}{your_name:<15s}{target_name:<15s}")
 
         total_num = len(msgs)
-        target_num = len([msg for msg in msgs if msg.author == target_name])
-        fp.write(f"All messages,{total_num},{total_num-target_num},{target_num}\n")
-        print_func(f"{'All messages'.ljust(20)}{total_num:<15d}{total_num-target_num:<15d}{target_num:<15d}")
-
-        msgs = stools.get_filtered(msgs, remove_forwards=True, remove_links=True, max_len=4095)
-
-        total_chars = sum([len(msg.text) for msg in msgs if not msg.is_forwarded])
-        target_chars = sum([len(msg.text) for msg in msgs if not msg.is_forwarded and msg.author == target_name])
-        fp.write(f"Characters,{total_chars},{total_chars-target_chars},{target_chars}\n")
-        print_func(f"{'Characters'.ljust(20)}{total_chars:<15d}{total_chars-target_chars:<15d}{target_chars:<15d}")
-
-        total_photos = len([msg for msg in msgs if msg.has_photo])
-        target_photos = len([msg for msg in msgs if msg.has_photo and msg.author == target_name])
-        fp.write(f"Photos,{total_photos},{total_photos-target_photos},{target_photos}\n")
-        print_func(f"{'Photos'.ljust(20)}{total_photos:<15d}{total_photos-target_photos:<15d}{target_photos:<15d}")
-
-        total_stickers = len([msg for msg in msgs if msg.has_sticker])
-        target_stickers = len([msg for msg in msgs if msg.has_sticker and msg.author == target_name])
-        fp.write(f"Stickers,{total_stickers},{total_stickers-target_stickers},{target_stickers}\n")
-        print_func((f"{'Stickers'.ljust(20)}{total_stickers:<15d}{total_stickers-target_stickers:<15d}"
-                    f"{target_stickers:<15d}"))
-
-        total_songs = len([msg for msg in msgs if msg.has_audio])
-        target_songs = len([msg for msg in msgs if msg.has_audio and msg.author == target_name])
-        fp.write(f"Songs (audio files),{total_songs},{total_songs-target_songs},{target_songs}\n")
-        print_func((f"{'Songs (audio files)'.ljust(20)}{total_songs:<15d}{total_songs-target_songs:<15d}"
-                    f"{target_songs:<15d}"))
-
-        total_voice = len([msg for msg in msgs if msg.has_voice])
-        target_voice = len([msg for msg in msgs if msg.has_voice and msg.author == target_name])
-        fp.write(f"Voice messages,{total_voice},{total_voice-target_voice},{target_voice}\n")
-        print_func(f"{'Voice messages'.ljust(20)}{total_voice:<15d}{total_voice-target_voice:<15d}{target_voice:<15d}")
-
-        total_video = len([msg for msg in msgs if msg.has_video])
-        target_video = len([msg for msg in msgs if msg.has_video and msg.author == target_name])
-        fp.write(f"Video messages,{total_video},{total_video-target_video},{target_video}\n")
-        print_func(f"{'Video messages'.ljust(20)}{total_video:<15d}{total_video-target_video:<15d}{target_video:<15d}")
-
+        is_target = columns["is_target"]
+        target_num = int(np.count_nonzero(is_target))
+        writer.writerow(["All messages", total_num, total_num - target_num, target_num])
+        report.append(f"{'All messages'.ljust(20)}{total_num:<15d}{total_num-target_num:<15d}{target_num:<15d}")
+
+        # The same messages as get_filtered(msgs, remove_forwards=True, remove_links=True, max_len=4095) gives.
+        kept = ~columns["is_forwarded"] & ~columns["is_link"] & (columns["text_len"] <= 4095)
+        values = np.stack([columns["text_len"], columns["has_photo"], columns["has_sticker"], columns["has_audio"],
+                           columns["has_voice"], columns["has_video"]], axis=1)[kept]
+        is_target = is_target[kept]
+        (total_chars, total_photos, total_stickers,
+         total_songs, total_voice, total_video) = (int(total) for total in values.sum(axis=0))
+        (target_chars, target_photos, target_stickers,
+         target_songs, target_voice, target_video) = (int(total) for total in values[is_target].sum(axis=0))
+
+        writer.writerow(["Characters", total_chars, total_chars - target_chars, target_chars])
+        report.append(f"{'Characters'.ljust(20)}{total_chars:<15d}{total_chars-target_chars:<15d}{target_chars:<15d}")
+
+        writer.writerow(["Photos", total_photos, total_photos - target_photos, target_photos])
+        report.append(f"{'Photos'.ljust(20)}{total_photos:<15d}{total_photos-target_photos:<15d}{target_photos:<15d}")
+
+        writer.writerow(["Stickers", total_stickers, total_stickers - target_stickers, target_stickers])
+        report.append((f"{'Stickers'.ljust(20)}{total_stickers:<15d}{total_stickers-target_stickers:<15d}"
+                       f"{target_stickers:<15d}"))
+
+        writer.writerow(["Songs (audio files)", total_songs, total_songs - target_songs, target_songs])
+        report.append((f"{'Songs (audio files)'.ljust(20)}{total_songs:<15d}{total_songs-target_songs:<15d}"
+                       f"{target_songs:<15d}"))
+
+        writer.writerow(["Voice messages", total_voice, total_voice - target_voice, target_voice])
+        report.append((f"{'Voice messages'.ljust(20)}{total_voice:<15d}{total_voice-target_voice:<15d}"
+                       f"{target_voice:<15d}"))
+
+        writer.writerow(["Video messages", total_video, total_video - target_video, target_video])
+        report.append((f"{'Video messages'.ljust(20)}{total_video:<15d}{total_video-target_video:<15d}"
+                       f"{target_video:<15d}"))
+
+    log_line("\n".join(report))
     log_line(f"Scalar info was saved into {dir_path}/scalar_info.csv file.")
 
 
-async def _plot_messages_distribution(msgs, your_name, target_name, results_directory):
-    """Shows how messages are distributed."""
-    plt.heat_map(msgs, results_directory)
-    await asyncio.sleep(delay)
-    plt.pie_messages_per_author(msgs, your_name, target_name, results_directory)
-    await asyncio.sleep(delay)
-    plt.stackplot_non_text_messages_percentage(msgs, results_directory)
-    await asyncio.sleep(delay)
-    plt.barplot_non_text_messages(msgs, results_directory)
-    await asyncio.sleep(delay)
-    plt.barplot_messages_per_weekday(msgs, your_name, target_name, results_directory)
-    await asyncio.sleep(delay)
-    plt.barplot_messages_per_day(msgs, results_directory)
-    await asyncio.sleep(delay)
-    plt.barplot_messages_per_minutes(msgs, results_directory)
-    await asyncio.sleep(delay)
-    plt.barplot_non_text_messages(msgs, results_directory)
-    await asyncio.sleep(delay)
-    plt.distplot_messages_per_hour(msgs, results_directory)
-    await asyncio.sleep(delay)
-    plt.distplot_messages_per_month(msgs, results_directory)
-    await asyncio.sleep(delay)
-    plt.distplot_messages_per_day(msgs, results_directory)
-    await asyncio.sleep(delay)
-    plt.lineplot_messages(msgs, your_name, target_name, results_directory)
-    await asyncio.sleep(delay)
-    log_line("Messages distribution was analysed.")
-
-
-async def _plot_messages_distribution_content_based(msgs, your_name, target_name, results_directory):
-    """Shows how some characteristics of messages content are distributed."""
-    plt.lineplot_message_length(msgs, your_name, target_name, results_directory)
-    await asyncio.sleep(delay)
-    plt.barplot_emojis(msgs, your_name, target_name, 10, results_directory)
-    await asyncio.sleep(delay)
-    log_line("Content based messages distribution was analysed.")
-
-
-async def _plot_words_distribution(msgs, your_name, target_name, results_directory, words):
-    """Shows how some words are distributed among the users."""
-    plt.barplot_words(msgs, your_name, target_name, words, 10, results_directory)
-    await asyncio.sleep(delay)
-    plt.wordcloud(msgs, words, results_directory)
-    await asyncio.sleep(delay)
-    log_line("Words distribution was analysed.")
+async def _run_plot_job(executor, func, context_index, args):
+    """Draws a plot in a worker process and logs its lines.
 
+    Notes:
+        A failure of the plot is logged (so other plots are still drawn), but a broken pool is not a plot failure.
 
-async def _plot_all(msgs, your_name, target_name, results_directory, words_file):
-    await save_scalar_info(msgs, your_name, target_name, results_directory)
-    await asyncio.sleep(delay)
-    await _plot_messages_distribution(msgs, your_name, target_name, results_directory)
-    await asyncio.sleep(delay)
+    Returns:
+        True if the plot was drawn.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+        lines = await loop.run_in_executor(executor, plt.draw_in_worker, func, context_index, args)
+    except BrokenProcessPool:
+        raise
+    except Exception as e:
+        log_line(f"Failed to draw {func.__name__}: {type(e).__name__}: {e}")
+        return False
+    for line in lines:
+        log_line(line)
+    return True
+
+
+async def _run_plot_jobs(executor, jobs):
+    """Draws plots concurrently in worker processes.
 
-    filtered_msgs = stools.get_filtered(msgs, remove_forwards=True, remove_empty=True, remove_links=True, max_len=4095)
+    Notes:
+        pyplot keeps a global state and isn't thread-safe, so plots are drawn by separate processes
+        (see plotter.init_worker). The event loop (and the GUI) keeps running meanwhile.
 
-    await _plot_messages_distribution_content_based(filtered_msgs, your_name, target_name, results_directory)
-    await asyncio.sleep(delay)
-    if words_file:
-        words = storage.get_words(words_file)
-        if words:
-            await _plot_words_distribution(filtered_msgs, your_name, target_name, results_directory, words)
-        await asyncio.sleep(delay)
+    Args:
+        executor (ProcessPoolExecutor): Workers prepared by plotter.init_worker.
+        jobs (list of tuples): (plotting function, index of the context to plot, the rest of its arguments).
+
+    Returns:
+        The number of plots which failed to be drawn.
+    """
+    drawn = await asyncio.gather(*(_run_plot_job(executor, func, index, args) for func, index, args in jobs))
+    return drawn.count(False)
+
+
+_all_context = 0  # indices of the contexts given to plotter.init_worker
+_filtered_context = 1
+
+
+def _get_plot_stages(your_name, target_name, results_directory, words):
+    """Gets plotting stages as (jobs, a line to log when they are done) pairs (see _run_plot_jobs)."""
+    stages = [
+        # how messages are distributed
+        ([(plt.heat_map, _all_context, (results_directory,)),
+          (plt.pie_messages_per_author, _all_context, (your_name, target_name, results_directory)),
+          (plt.stackplot_non_text_messages_percentage, _all_context, (results_directory,)),
+          (plt.barplot_non_text_messages, _all_context, (results_directory,)),
+          (plt.barplot_messages_per_weekday, _all_context, (your_name, target_name, results_directory)),
+          (plt.barplot_messages_per_day, _all_context, (results_directory,)),
+          (plt.barplot_messages_per_minutes, _all_context, (results_directory,)),
+          (plt.distplot_messages_per_hour, _all_context, (results_directory,)),
+          (plt.distplot_messages_per_month, _all_context, (results_directory,)),
+          (plt.distplot_messages_per_day, _all_context, (results_directory,)),
+          (plt.lineplot_messages, _all_context, (your_name, target_name, results_directory))],
+         "Messages distribution was analysed."),
+        # how some characteristics of messages content are distributed
+        ([(plt.lineplot_message_length, _filtered_context, (your_name, target_name, results_directory)),
+          (plt.barplot_emojis, _filtered_context, (your_name, target_name, 10, results_directory))],
+         "Content based messages distribution was analysed."),
+    ]
+    if words:  # how some words are distributed among the users
+        stages.append(([(plt.barplot_words, _filtered_context, (your_name, target_name, words, 10, results_directory)),
+                        (plt.wordcloud, _filtered_context, (words, results_directory))],
+                       "Words distribution was analysed."))
+    return stages
+
+
+async def _plot_all(msgs, your_name, target_name, results_directory, words_file):
+    columns = stools.get_columns(msgs, target_name)
+    await save_scalar_info(msgs, your_name, target_name, results_directory, columns=columns)
+    await asyncio.sleep(0)  # lets the GUI update; plotting stages yield between their plots themselves
+
+    # The same as get_filtered(msgs, remove_forwards=True, remove_empty=True, remove_links=True, max_len=4095).
+    text_len = columns["text_len"]
+    kept = ~columns["is_forwarded"] & ~columns["is_link"] & (text_len > 0) & (text_len <= 4095)
+
+    # Workers get messages as numpy arrays (texts only for the plots of the content), once for all the stages.
+    authors, author_codes = stools.get_authors_coded(msgs)
+    contexts = (plt.PlotContext(columns, authors, author_codes),
+                plt.PlotContext({name: column[kept] for name, column in columns.items()}, authors, author_codes[kept],
+                                [msg.text for msg in itertools.compress(msgs, kept)]))
+
+    stages = _get_plot_stages(your_name, target_name, results_directory,
+                              storage.get_words(words_file) if words_file else None)
+    executor = ProcessPoolExecutor(max_workers=min(max(len(jobs) for jobs, _ in stages), os.cpu_count() or 1),
+                                   initializer=plt.init_worker, initargs=contexts)
+    try:
+        failed = 0
+        for jobs, done_line in stages:
+            failed += await _run_plot_jobs(executor, jobs)
+            log_line(done_line)
+    except BaseException:  # e.g. cancelled: the plots being drawn are not waited for
+        executor.shutdown(wait=False)
+        raise
+    # workers are joined without blocking the event loop
+    await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+    if failed:
+        log_line(f"Plots which failed to be drawn: {failed} (the results are partial).")
 
 
 async def _get_all_messages(dialog, vkopt_file, your_name, target_name, loop):
     msgs = []
     if dialog != -1:
         msgs.extend(await tlg.get_telegram_messages(your_name, target_name, loop=loop, target_id=dialog))
-    await  asyncio.sleep(delay)
     if vkopt_file:
         msgs.extend(vkOpt.get_mymessages_from_file(your_name, target_name, vkopt_file))
-        await  asyncio.sleep(delay)
-        msgs.sort(key=lambda msg: msg.date)
-    await  asyncio.sleep(delay)
+        await asyncio.sleep(0)
+        msgs = [msgs[i] for i in np.argsort(stools.get_dates(msgs), kind="stable").tolist()]
     return msgs
 
 
+def _get_top_indices(counts, num):
+    """Gets indices of the num largest counts (larger first, equal counts in the order of indices).
+
+    Notes:
+        Only the values not smaller than the num-th largest one are sorted, the rest are skipped by a partition.
+    """
+    num = min(num, len(counts))
+    if not num:
+        return np.array([], dtype=np.int64)
+    candidates = np.flatnonzero(counts >= np.partition(counts, -num)[-num])
+    return candidates[np.argsort(-counts[candidates], kind="stable")[:num]]
+
+
 def _save_words(msgs, your_name, target_name, path):
-    total_words_cnt = stools.get_words_countered(msgs)
-    top_words = [w for w, c in total_words_cnt.most_common(1000)]
-    your_words_cnt = stools.get_words_countered([msg for msg in msgs if msg.author == your_name])
-    target_words_cnt = stools.get_words_countered([msg for msg in msgs if msg.author == target_name])
+    # Messages are tokenized once, words of each author are selected by masks and counted by numpy.
+    words, codes, msg_indices = stools.get_words_coded(msgs)
+    authors = np.array([0 if msg.author == your_name else 1 if msg.author == target_name else 2 for msg in msgs],
+                       dtype=np.int8)[msg_indices]
+
+    your_counts = np.bincount(codes[authors == 0], minlength=len(words))
+    target_counts = np.bincount(codes[authors == 1], minlength=len(words))
+    total_counts = np.bincount(codes, minlength=len(words))  # words of all the authors are ranked
+    used = np.flatnonzero(total_counts)
+    top_words = [words[i] for i in used[_get_top_indices(total_counts[used], 1000)]]
+    your_words_cnt = Counter(dict(zip(words, your_counts.tolist())))
+    target_words_cnt = Counter(dict(zip(words, target_counts.tolist())))
     storage.store_top_words_count(top_words, your_words_cnt, target_words_cnt, path)
 
 
@@ -189,8 +261,6 @@ async def _analyse(msgs, your_name, target_name, words_file, store_msgs=True, st
     if not os.path.exists(results_directory):
         os.makedirs(results_directory)
 
-    await asyncio.sleep(delay)
-
     if store_msgs:
         file_with_msgs = "messages.txt"
         storage.store_msgs(os.path.join(results_directory, file_with_msgs), msgs)
@@ -198,7 +268,7 @@ async def _analyse(msgs, your_name, target_name, words_file, store_msgs=True, st
         file_with_words = "words.txt"
         _save_words(msgs, your_name, target_name, os.path.join(results_directory, file_with_words))
 
-    await asyncio.sleep(delay)
+    await asyncio.sleep(0)
 
     await _plot_all(msgs, your_name, target_name, results_directory, words_file)
 
@@ -213,19 +283,21 @@ def analyse_from_file(path):
     """
     _, _, words_file, your_name, target_name = storage.get_session_params()
     msgs = storage.get_msgs(path)
-    asyncio.get_event_loop().run_until_complete(_analyse(msgs, your_name, target_name, words_file, store_msgs=False))
+    asyncio.run(_analyse(msgs, your_name, target_name, words_file, store_msgs=False))
 
 
-async def retrieve_and_analyse(loop):
+async def retrieve_and_analyse(loop=None):
     """(async) Analyses messages from VkOpt file and/or Telegram dialogue.
 
     Notes:
         Requires all the necessary configuration parameters (config.ini file) to be set either by GUI or manually.
     """
+    if loop is None:
+        loop = asyncio.get_running_loop()
     dialog, vkopt_file, words_file, your_name, target_name = storage.get_session_params()
     msgs = await _get_all_messages(dialog, vkopt_file, your_name, target_name, loop)
     await _analyse(msgs, your_name, target_name, words_file)
 
 
 if __name__ == "__main__":
-    asyncio.get_event_loop().run_until_complete(retrieve_and_analyse(asyncio.get_event_loop()))
+    asyncio.run(retrieve_and_analyse())
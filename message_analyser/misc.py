@@ -1,7 +1,6 @@
 import time
 import logging
 
-delay = 0.05
 months_border = 2 # if the conversation is shorter than this values than xticks will be weeks, not months.
 
 
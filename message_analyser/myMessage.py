@@ -2,24 +2,37 @@ import re
 from datetime import datetime
 
 
+# https://stackoverflow.com/a/7160778
+_LINK_RE = re.compile(
+    r'^(?:http|ftp)s?://'  # http:// or https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  # domain...
+    r'localhost|'  # localhost...
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
+    r'(?::\d+)?'  # optional port
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+
+
+_link_prefixes = ("http://", "https://", "ftp://", "ftps://")
+
+
 def islink(string):
-    # https://stackoverflow.com/a/7160778
-    regex = re.compile(
-        r'^(?:http|ftp)s?://'  # http:// or https://
-        r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  # domain...
-        r'localhost|'  # localhost...
-        r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
-        r'(?::\d+)?'  # optional port
-        r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-    return re.match(regex, string) is not None
-
-
-class MyMessage(dict):
+    # Most of the messages are rejected by this cheap check without running the regex (which ignores case).
+    if not string[:8].lower().startswith(_link_prefixes):
+        return False
+    return _LINK_RE.match(string) is not None
+
+
+class MyMessage:
     """Represents a message entity from some messenger.
 
+    Notes:
+        Attributes are stored in slots (not in a per-instance dict) and can't be changed once set.
+
     Attributes:
         See __init__ args.
     """
+    __slots__ = ("text", "date", "author", "is_forwarded", "document_id",
+                 "has_photo", "has_voice", "has_audio", "has_video", "has_sticker", "is_link")
 
     def __init__(self, text, date, author,
                  is_forwarded=False,
@@ -51,24 +64,23 @@ class MyMessage(dict):
             has_sticker (bool): True if the message has sticker.
             is_link (bool): True if the whole text of the message is a link.
         """
-        super().__init__()
-        attributes = {"text": text,
-                      "date": date,
-                      "author": author,
-                      "is_forwarded": is_forwarded,
-                      "document_id": document_id,
-                      "has_photo": has_photo,
-                      "has_voice": has_voice,
-                      "has_audio": has_audio,
-                      "has_video": has_video,
-                      "has_sticker": has_sticker,
-                      "is_link": is_link
-                      }
         if not isinstance(date, datetime):
-            attributes["date"] = datetime.strptime(str(date), "%Y-%m-%d %H:%M:%S")
+            date = datetime.fromisoformat(str(date))  # "%Y-%m-%d %H:%M:%S" is an ISO format
         if is_link is None:
-            attributes["is_link"] = islink(text)
-        self.update(attributes)
+            is_link = islink(text)
+        # Slots are filled directly (like a frozen dataclass does), bypassing the immutable __setattr__.
+        set_attr = object.__setattr__
+        set_attr(self, "text", text)
+        set_attr(self, "date", date)
+        set_attr(self, "author", author)
+        set_attr(self, "is_forwarded", is_forwarded)
+        set_attr(self, "document_id", document_id)
+        set_attr(self, "has_photo", has_photo)
+        set_attr(self, "has_voice", has_voice)
+        set_attr(self, "has_audio", has_audio)
+        set_attr(self, "has_video", has_video)
+        set_attr(self, "has_sticker", has_sticker)
+        set_attr(self, "is_link", is_link)
 
     def __str__(self):
         return (f"Author = {self.author}\n"
@@ -82,13 +94,22 @@ class MyMessage(dict):
     def __repr__(self):
         return str(self)
 
-    def __getattr__(self, attr):
-        return self[attr]
-
     def __setattr__(self, key, value):
-        if key in self:
-            raise Exception("Can't mutate an Immutable: self.%s = %r" % (key, value))
-        self[key] = value
+        raise Exception("Can't mutate an Immutable: self.%s = %r" % (key, value))
+
+    def __eq__(self, other):
+        if not isinstance(other, MyMessage):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # slots are passed to __init__ in the same order (__setattr__ can't be used for unpickling)
+        return MyMessage, tuple(getattr(self, attr) for attr in self.__slots__)
+
+    def to_dict(self):
+        return {attr: getattr(self, attr) for attr in self.__slots__}
 
     @staticmethod
     def from_dict(d):
@@ -1,9 +1,10 @@
 import os
+import heapq
 import emoji
-import random
-import operator
+import logging
+import itertools
+import logging.handlers
 import numpy as np
-import pandas as pd
 import seaborn as sns
 import wordcloud as wc
 import matplotlib
@@ -13,7 +14,61 @@ import matplotlib.cm as cm
 import matplotlib.pyplot as plt
 import matplotlib.colors as mpl_colors
 import message_analyser.structure_tools as stools
-from message_analyser.misc import avg, log_line, months_border
+from message_analyser.misc import log_line, months_border
+
+
+SAVE_DPI = 150  # charts don't get any clearer at a higher resolution, but take much longer to render and save
+HEAT_MAP_DPI = 300  # the heat map has small cells and thin lines
+
+
+def _get_circle_mask(radius):
+    """Gets a word cloud mask which leaves a circle of the given radius (pixels outside of it are 255)."""
+    x, y = np.ogrid[:2 * radius, :2 * radius]
+    return 255 * ((x - radius) ** 2 + (y - radius) ** 2 > radius ** 2).astype(np.uint8)
+
+
+_wordcloud_mask = _get_circle_mask(500)  # the cloud will be a circle.
+
+_worker_log = None
+_worker_contexts = None
+
+
+def init_worker(*contexts):
+    """Prepares a worker process to draw plots (an initializer of a ProcessPoolExecutor).
+
+    Notes:
+        Contexts are sent to each worker once (they keep messages as numpy arrays, see PlotContext), so plots
+        drawn by the same worker share their groupings. Log lines are kept to be returned by draw_in_worker.
+
+    Args:
+        *contexts (PlotContext objects): Contexts of the messages the plots will be drawn for.
+    """
+    global _worker_log, _worker_contexts
+    plt.switch_backend("Agg")
+    _worker_log = logging.handlers.BufferingHandler(capacity=10000)
+    logger = logging.getLogger("message_analyser")
+    logger.handlers = [_worker_log]
+    logger.propagate = False
+    _worker_contexts = contexts
+
+
+def draw_in_worker(func, context_index, args):
+    """Draws a plot in a worker process prepared by init_worker.
+
+    Args:
+        func (function): A plotting function of this module.
+        context_index (int): An index of the context (given to init_worker) to draw the plot for.
+        args (tuple): The rest of its positional arguments.
+
+    Returns:
+        A list of lines the function has logged.
+    """
+    try:
+        func(_worker_contexts[context_index], *args)
+        return [record.getMessage().rstrip('\n') for record in _worker_log.buffer]
+    finally:
+        _worker_log.buffer.clear()
+        plt.close("all")  # a failed plot mustn't leave its figure to the next one
 
 
 def _change_bar_width(ax, new_value):
@@ -29,20 +84,134 @@ def _change_bar_width(ax, new_value):
         patch.set_x(patch.get_x() + diff * .5)
 
 
+_non_text_types = (("audio", "has_audio"), ("voice", "has_voice"), ("photo", "has_photo"),
+                   ("video", "has_video"), ("sticker", "has_sticker"), ("link", "is_link"))
+
+
+class PlotContext:
+    """Messages as numpy arrays and their groupings which are shared by different plots.
+
+    Notes:
+        Plotting functions of this module take either a list of messages or a PlotContext of them.
+        MyMessage objects aren't kept, so a context is cheap to send to a worker process (see init_worker).
+        Each grouping is computed once (when it is needed first) and must not be mutated by plots.
+
+    Attributes:
+        columns (dict): Attributes of the messages as numpy arrays (see structure_tools.get_columns).
+        authors (list of strings): Names of the authors.
+        author_codes (numpy int array): Indices (in authors) of the messages authors.
+        texts (list of strings, optional): Texts of the messages (only plots of words and emojis need them).
+    """
+
+    def __init__(self, columns, authors, author_codes, texts=None):
+        self.columns = columns
+        self.authors = authors
+        self.author_codes = author_codes
+        self.texts = texts
+        self._cache = dict()
+
+    @classmethod
+    def from_msgs(cls, msgs):
+        """Makes a context of messages (with their texts)."""
+        authors, author_codes = stools.get_authors_coded(msgs)
+        return cls(stools.get_columns(msgs), authors, author_codes, [msg.text for msg in msgs])
+
+    def _get(self, key, func, *args):
+        if key not in self._cache:
+            self._cache[key] = func(*args)
+        return self._cache[key]
+
+    @property
+    def dates(self):
+        """See structure_tools.get_dates."""
+        return self.columns["date"]
+
+    @property
+    def days(self):
+        """Days of the messages as a numpy datetime64[D] array."""
+        return self._get("days", self.dates.astype, "datetime64[D]")
+
+    @property
+    def day_counts(self):
+        """The numbers of messages of each day between the first and the last message (numpy int array)."""
+        return self._get("day_counts", lambda: np.bincount((self.days - self.days[0]).astype(np.int64)))
+
+    @property
+    def months(self):
+        """See structure_tools.get_months."""
+        def get_months():
+            first, last = self.dates[[0, -1]].astype("datetime64[M]")
+            return np.arange(first, last + 1).astype("datetime64[D]").tolist()
+        return self._get("months", get_months)
+
+    def plot_axes(self, crop=True):
+        """See _get_plot_axes (the first tick label is removed by _crop_xticks_labels if crop is True)."""
+        x, periods, xticks, xticks_labels, xlabel = self._get("plot_axes", _get_plot_axes, self.dates)
+        if crop:
+            xticks_labels = _crop_xticks_labels(xticks, xticks_labels, xlabel)
+        return x, periods, xticks, xticks_labels, xlabel
+
+    def non_text_per_period(self):
+        """See structure_tools.get_non_text_messages_grouped (messages are grouped by periods of plot_axes)."""
+        def count():
+            x, periods = self.plot_axes()[:2]
+            return [{"groups": np.bincount(periods[self.columns[flag]], minlength=len(x)).tolist(), "type": msg_type}
+                    for msg_type, flag in _non_text_types]
+        return self._get("non_text_per_period", count)
+
+    def is_author(self, name):
+        """Gets a numpy bool array which is True for the messages of a single author."""
+        code = self.authors.index(name) if name in self.authors else -1
+        return self._get(("is_author", name), lambda: self.author_codes == code)
+
+    def _get_texts(self, name=None):
+        if self.texts is None:
+            raise ValueError("Texts of messages are not kept by this context.")
+        return self.texts if name is None else list(itertools.compress(self.texts, self.is_author(name)))
+
+    def words_countered(self, name=None):
+        """See structure_tools.get_words_countered (for the messages of a single author if name is given)."""
+        return self._get(("words_countered", name), lambda: stools.count_words(self._get_texts(name)))
+
+    def emoji_countered(self, name=None):
+        """See structure_tools.get_emoji_countered (for the messages of a single author if name is given)."""
+        return self._get(("emoji_countered", name), lambda: stools.count_emojis(self._get_texts(name)))
+
+
+_context = None  # the last list of messages and its PlotContext
+
+
+def _get_context(msgs):
+    """Gets a PlotContext of msgs (the same one while the plots are drawn for the same list of messages).
+
+    Args:
+        msgs (list of MyMessage objects or PlotContext): Messages (a context is returned as it is).
+    """
+    global _context
+    if isinstance(msgs, PlotContext):
+        return msgs
+    if _context is None or _context[0] is not msgs:
+        _context = (msgs, PlotContext.from_msgs(msgs))
+    return _context[1]
+
+
 def heat_map(msgs, path_to_save, seasons=False):
     sns.set(style="whitegrid")
 
-    messages_per_day = stools.get_messages_per_day(msgs)
-    months = stools.date_months_to_str_months(stools.get_months(msgs))
-    heat_calendar = {month: np.array([None] * 31, dtype=np.float64) for month in months}
-    for day, d_msgs in messages_per_day.items():
-        heat_calendar[stools.str_month(day)][day.day - 1] = len(d_msgs)
+    ctx = _get_context(msgs)
+    day_counts = ctx.day_counts
+    months = stools.date_months_to_str_months(ctx.months)
+    # a row for each month, days which are out of messages history are NaN
+    days = ctx.days[0] + np.arange(len(day_counts))
+    days_months = days.astype("datetime64[M]")
+    data = np.full((len(months), 31), np.nan)
+    data[(days_months - days_months[0]).astype(np.int64),
+         (days - days_months.astype("datetime64[D]")).astype(np.int64)] = day_counts
 
     # min_day = len(min(messages_per_day.values(), key=len))
-    max_day = len(max(messages_per_day.values(), key=len))
+    max_day = int(np.nanmax(data))
 
-    data = np.array(list(heat_calendar.values()))
-    mask = np.array([np.array(arr, dtype=bool) for arr in data])
+    mask = data.astype(bool)  # NaN is True as well, so only the days without messages are not masked
 
     cmap = cm.get_cmap("Purples")
 
@@ -66,7 +235,7 @@ def heat_map(msgs, path_to_save, seasons=False):
     plt.tight_layout()
     fig = plt.gcf()
     fig.set_size_inches(11, 8)
-    fig.savefig(os.path.join(path_to_save, heat_map.__name__ + ".png"), dpi=500)
+    fig.savefig(os.path.join(path_to_save, heat_map.__name__ + ".png"), dpi=HEAT_MAP_DPI)
 
     # plt.show()
     plt.close("all")
@@ -74,10 +243,11 @@ def heat_map(msgs, path_to_save, seasons=False):
 
 
 def pie_messages_per_author(msgs, your_name, target_name, path_to_save):
-    forwarded = len([msg for msg in msgs if msg.is_forwarded])
-    msgs = list(filter(lambda msg: not msg.is_forwarded, msgs))
-    your_messages_len = len([msg for msg in msgs if msg.author == your_name])
-    target_messages_len = len(msgs) - your_messages_len
+    ctx = _get_context(msgs)
+    is_forwarded = ctx.columns["is_forwarded"]
+    forwarded = int(np.count_nonzero(is_forwarded))
+    your_messages_len = int(np.count_nonzero(~is_forwarded & ctx.is_author(your_name)))
+    target_messages_len = len(is_forwarded) - forwarded - your_messages_len
     data = [your_messages_len, target_messages_len, forwarded]
     labels = [f"{your_name}\n({your_messages_len})",
               f"{target_name}\n({target_messages_len})",
@@ -96,73 +266,57 @@ def pie_messages_per_author(msgs, your_name, target_name, path_to_save):
 
     plt.setp(autotexts, size=10, weight="bold")
 
-    fig.savefig(os.path.join(path_to_save, pie_messages_per_author.__name__ + ".png"), dpi=500)
+    fig.savefig(os.path.join(path_to_save, pie_messages_per_author.__name__ + ".png"), dpi=SAVE_DPI)
     # plt.show()
     plt.close("all")
     log_line(f"{pie_messages_per_author.__name__} was created.")
 
 
-def _get_xticks(msgs, crop=True):
-    start_date = msgs[0].date.date()
-    xticks = []
-    months_num = stools.count_months(msgs)
-    if months_num > months_border:
+def _get_plot_axes(dates):
+    """Gets periods (months or weeks) of messages and the x axis to plot them.
+
+    Args:
+        dates (numpy datetime64 array): Dates of the messages (see structure_tools.get_dates).
+
+    Returns:
+        x, periods, xticks, xticks_labels, xlabel (tuple):
+            x is a list of values for the x axis (one for each period).
+            periods is a numpy int array of indices of the messages periods.
+            xticks is a list of days (counting from the first message's day) the periods start at.
+            xticks_labels is a list of the periods names.
+            xlabel is "month" or "week".
+    """
+    days = dates.astype("datetime64[D]")
+    if stools.count_months_between(*dates[[0, -1]].tolist()) > months_border:
         xlabel = "month"
-        months_ticks = stools.get_months(msgs)
-        xticks_labels = stools.date_months_to_str_months(months_ticks)
-        if (months_ticks[1] - start_date).days < 10 and crop:
-            xticks_labels[0] = ""  # remove first short month tick for better look
-        for month in months_ticks:
-            xticks.append(max(0, (month - start_date).days))
-            # it has max because start date is usually later than first month date.
+        months = dates.astype("datetime64[M]")
+        periods = (months - months[0]).astype(np.int64)
+        period_starts = np.arange(months[0], months[-1] + 1).astype("datetime64[D]")
+        xticks_labels = stools.date_months_to_str_months(period_starts.tolist())
     else:  # too short message history -> we split data by weeks, not months
         xlabel = "week"
-        weeks_ticks = stools.get_weeks(msgs)
-        xticks_labels = stools.date_days_to_str_days(weeks_ticks)
-        if len(weeks_ticks) > 2 and (weeks_ticks[1] - start_date).days < 3 and crop:
-            xticks_labels[0] = ""  # remove first short week tick for better look
-        for date in weeks_ticks:
-            xticks.append(max(0, (date - start_date).days))
-            #  it has max because start date is usually later than first week date.
-
-    return xticks, xticks_labels, xlabel
+        weeks = days - (days.astype(np.int64) + 3) % 7  # Mondays of the weeks (1970-01-01 was Thursday)
+        periods = (weeks - weeks[0]).astype(np.int64) // 7
+        period_starts = np.arange(weeks[0], days[-1] + 1, 7)
+        xticks_labels = stools.date_days_to_str_days(period_starts.tolist())
 
+    start_date = days[0]
+    # it has max because start date is usually later than the first period date.
+    xticks = np.maximum((period_starts - start_date).astype(np.int64), 0)
 
-def _get_plot_data(msgs):
-    """Gets grouped data to plot.
+    # put x values at the middle of each bar (bin), the last one ends at the last message's day
+    x = (xticks + np.append(xticks[1:], (days[-1] - start_date).astype(np.int64))) / 2
+    # except for the first value
+    x[0] = xticks[0]
 
-    Returns:
-        x, y (tuple):
-            x is a list of values for the x axis.
-            y is a list of groups of messages (for y axis).
-    """
-    start_date = msgs[0].date.date()
-    end_date = msgs[-1].date.date()
-    xticks = []
-    months_num = stools.count_months(msgs)
-    if months_num > months_border:
-        messages_per_month = stools.get_messages_per_month(msgs)
-        months_ticks = list(messages_per_month.keys())
-        for month in months_ticks:
-            xticks.append(max(0, (month - start_date).days))
-            # it has max because start date is usually later than first month date.
-        y = list(messages_per_month.values())
-    else:  # too short message history -> we split data by weeks, not months
-        messages_per_week = stools.get_messages_per_week(msgs)
-        days_ticks = messages_per_week.keys()
-        for date in days_ticks:
-            xticks.append(max(0, (date - start_date).days))
-            #  it has max because start date is usually later than first week date.
-        y = list(messages_per_week.values())
+    return x.tolist(), periods, xticks.tolist(), xticks_labels, xlabel
 
-    # put x values at the middle of each bar (bin)
-    x = [(xticks[i] + xticks[i + 1]) / 2 for i in range(1, len(xticks) - 1)]
-    # except for the first and the last values
-    x.insert(0, xticks[0])
-    if len(y) > 1:
-        x.append((xticks[-1] + (end_date - start_date).days) / 2)
 
-    return x, y
+def _crop_xticks_labels(xticks, xticks_labels, xlabel):
+    """Removes the first tick label if its period is too short (for better look)."""
+    if (xlabel == "month" and xticks[1] < 10) or (xlabel == "week" and len(xticks) > 2 and xticks[1] < 3):
+        return [""] + xticks_labels[1:]
+    return xticks_labels
 
 
 def stackplot_non_text_messages_percentage(msgs, path_to_save):
@@ -170,20 +324,17 @@ def stackplot_non_text_messages_percentage(msgs, path_to_save):
 
     colors = ['y', 'b', 'c', 'r', 'g', 'm']
 
-    (x, y_total), (xticks, xticks_labels, xlabel) = _get_plot_data(msgs), _get_xticks(msgs)
+    ctx = _get_context(msgs)
+    x, _, xticks, xticks_labels, xlabel = ctx.plot_axes()
 
-    stacks = stools.get_non_text_messages_grouped(y_total)
+    stacks = ctx.non_text_per_period()
 
-    # Normalize values
-    for i in range(len(stacks[0]["groups"])):
-        total = sum(stack["groups"][i] for stack in stacks)
-        for stack in stacks:
-            if not total:
-                stack["groups"][i] = 0
-            else:
-                stack["groups"][i] /= total
+    # Normalize values (periods without non-text messages stay 0)
+    data = np.array([stack["groups"] for stack in stacks], dtype=np.float64)
+    totals = data.sum(axis=0)
+    np.divide(data, totals, out=data, where=totals != 0)
 
-    plt.stackplot(x, *[stack["groups"] for stack in stacks], labels=[stack["type"] for stack in stacks],
+    plt.stackplot(x, *data, labels=[stack["type"] for stack in stacks],
                   colors=colors, alpha=0.7)
 
     plt.margins(0, 0)
@@ -206,7 +357,7 @@ def stackplot_non_text_messages_percentage(msgs, path_to_save):
     fig = plt.gcf()
     fig.set_size_inches(11, 8)
 
-    fig.savefig(os.path.join(path_to_save, stackplot_non_text_messages_percentage.__name__ + ".png"), dpi=500)
+    fig.savefig(os.path.join(path_to_save, stackplot_non_text_messages_percentage.__name__ + ".png"), dpi=SAVE_DPI)
     # plt.show()
     log_line(f"{stackplot_non_text_messages_percentage.__name__} was created.")
     plt.close("all")
@@ -217,19 +368,16 @@ def barplot_non_text_messages(msgs, path_to_save):
 
     colors = ['y', 'b', 'c', 'r', 'g', 'm']
 
-    (x, y_total), (xticks, xticks_labels, xlabel) = _get_plot_data(msgs), _get_xticks(msgs, crop=False)
+    ctx = _get_context(msgs)
+    _, _, xticks, xticks_labels, xlabel = ctx.plot_axes(crop=False)
 
-    bars = stools.get_non_text_messages_grouped(y_total)
+    bars = ctx.non_text_per_period()
 
-    # bars are overlapping, so firstly we need to sum up the all...
-    sum_bars = [0] * len(y_total)
-    for bar in bars:
-        sum_bars = list(map(operator.add, sum_bars, bar["groups"]))
-    # ... plot and subtract one by one.
+    # bars are overlapping, so each bar is a sum of its own group and all the next ones.
+    sum_bars = np.array([bar["groups"] for bar in bars])[::-1].cumsum(axis=0)[::-1]
     for i, bar in enumerate(bars[:-1]):
-        sns.barplot(x=xticks_labels, y=sum_bars, label=bar["type"], color=colors[i])
-        sum_bars = list(map(operator.sub, sum_bars, bar["groups"]))
-    ax = sns.barplot(x=xticks_labels, y=sum_bars, label=bars[-1]["type"], color=colors[-1])
+        sns.barplot(x=xticks_labels, y=sum_bars[i], label=bar["type"], color=colors[i])
+    ax = sns.barplot(x=xticks_labels, y=sum_bars[-1], label=bars[-1]["type"], color=colors[-1])
     _change_bar_width(ax, 1.)
 
     # https://stackoverflow.com/a/4701285
@@ -246,7 +394,7 @@ def barplot_non_text_messages(msgs, path_to_save):
     fig = plt.gcf()
     fig.set_size_inches(16, 8)
 
-    fig.savefig(os.path.join(path_to_save, barplot_non_text_messages.__name__ + ".png"), dpi=500)
+    fig.savefig(os.path.join(path_to_save, barplot_non_text_messages.__name__ + ".png"), dpi=SAVE_DPI)
     # plt.show()
     log_line(f"{barplot_non_text_messages.__name__} was created.")
     plt.close("all")
@@ -256,16 +404,17 @@ def barplot_messages_per_day(msgs, path_to_save):
     sns.set(style="whitegrid", palette="muted")
     sns.despine(top=True)
 
-    messages_per_day_vals = stools.get_messages_per_day(msgs).values()
+    ctx = _get_context(msgs)
+    day_counts = ctx.day_counts
 
-    xticks, xticks_labels, xlabel = _get_xticks(msgs)
+    _, _, xticks, xticks_labels, xlabel = ctx.plot_axes()
 
-    min_day = len(min(messages_per_day_vals, key=lambda day: len(day)))
-    max_day = len(max(messages_per_day_vals, key=lambda day: len(day)))
+    min_day = int(day_counts.min())
+    max_day = int(day_counts.max())
     pal = sns.color_palette("Greens_d", max_day - min_day + 1)[::-1]
 
-    ax = sns.barplot(x=list(range(len(messages_per_day_vals))), y=[len(day) for day in messages_per_day_vals],
-                     edgecolor="none", palette=np.array(pal)[[len(day) - min_day for day in messages_per_day_vals]])
+    ax = sns.barplot(x=list(range(len(day_counts))), y=day_counts.tolist(),
+                     edgecolor="none", palette=np.array(pal)[day_counts - min_day])
     _change_bar_width(ax, 1.)
     ax.set(xlabel=xlabel, ylabel="messages")
     ax.set_xticklabels(xticks_labels)
@@ -275,7 +424,7 @@ def barplot_messages_per_day(msgs, path_to_save):
 
     fig = plt.gcf()
     fig.set_size_inches(20, 10)
-    fig.savefig(os.path.join(path_to_save, barplot_messages_per_day.__name__ + ".png"), dpi=500)
+    fig.savefig(os.path.join(path_to_save, barplot_messages_per_day.__name__ + ".png"), dpi=SAVE_DPI)
 
     # plt.show()
     log_line(f"{barplot_messages_per_day.__name__} was created.")
@@ -286,18 +435,21 @@ def barplot_messages_per_minutes(msgs, path_to_save, minutes=2):
     sns.set(style="whitegrid", palette="muted")
     sns.despine(top=True)
 
-    messages_per_minutes = stools.get_messages_per_minutes(msgs, minutes)
+    dates = _get_context(msgs).dates
+    day_minutes = (dates.astype("datetime64[m]") - dates.astype("datetime64[D]")).astype(np.int64)
+    # the same intervals structure_tools.get_messages_per_minutes has
+    minutes_counts = np.bincount(day_minutes // minutes, minlength=len(range(0, 24 * 60, minutes)))
 
     xticks_labels = stools.get_hours()
     xticks = [i * 60 // minutes for i in range(24)]
 
-    min_minutes = len(min(messages_per_minutes.values(), key=lambda day: len(day)))
-    max_minutes = len(max(messages_per_minutes.values(), key=lambda day: len(day)))
+    min_minutes = int(minutes_counts.min())
+    max_minutes = int(minutes_counts.max())
     pal = sns.color_palette("GnBu_d", max_minutes - min_minutes + 1)[::-1]
 
-    ax = sns.barplot(x=list(range(len(messages_per_minutes))), y=[len(day) for day in messages_per_minutes.values()],
+    ax = sns.barplot(x=list(range(len(minutes_counts))), y=minutes_counts.tolist(),
                      edgecolor="none",
-                     palette=np.array(pal)[[len(day) - min_minutes for day in messages_per_minutes.values()]])
+                     palette=np.array(pal)[minutes_counts - min_minutes])
     _change_bar_width(ax, 1.)
     ax.set(xlabel="hour", ylabel="messages")
     ax.set_xticklabels(xticks_labels)
@@ -308,38 +460,64 @@ def barplot_messages_per_minutes(msgs, path_to_save, minutes=2):
     fig = plt.gcf()
     fig.set_size_inches(20, 10)
 
-    fig.savefig(os.path.join(path_to_save, barplot_messages_per_minutes.__name__ + ".png"), dpi=500)
+    fig.savefig(os.path.join(path_to_save, barplot_messages_per_minutes.__name__ + ".png"), dpi=SAVE_DPI)
     # plt.show()
     log_line(f"{barplot_messages_per_minutes.__name__} was created.")
     plt.close("all")
 
 
+def _barplot_pair(labels, your_values, target_values, your_name, target_name, horizontal=False):
+    """Draws bars of two authors side by side for each label (the way a seaborn barplot with hue does).
+
+    Args:
+        labels (list of strings): Labels of the bar groups.
+        your_values (list of ints): Your values (one for each label).
+        target_values (list of ints): Target's values (one for each label).
+        your_name (str): Your name.
+        target_name (str): Target's name.
+        horizontal (bool, optional): Whether bars are horizontal (labels go down the y axis).
+
+    Returns:
+        Axes object.
+    """
+    ax = plt.gca()
+    colors = sns.color_palette(sns.color_palette("PuBu", 2), desat=.75)
+    positions = np.arange(len(labels))
+    bar = ax.barh if horizontal else ax.bar
+    for offset, values, name, color in zip((-.2, .2), (your_values, target_values), (your_name, target_name), colors):
+        bar(positions + offset, values, .392, color=color, align="center", label=name)
+
+    axis, set_ticks, set_ticklabels, set_lim = ((ax.yaxis, ax.set_yticks, ax.set_yticklabels, ax.set_ylim)
+                                                if horizontal else
+                                                (ax.xaxis, ax.set_xticks, ax.set_xticklabels, ax.set_xlim))
+    set_ticks(positions)
+    set_ticklabels(labels)
+    axis.grid(False)
+    set_lim(-.5, len(labels) - .5)
+    if horizontal:
+        ax.invert_yaxis()
+    return ax
+
+
 def barplot_words(msgs, your_name, target_name, words, topn, path_to_save):
     sns.set(style="whitegrid")
 
-    your_msgs = [msg for msg in msgs if msg.author == your_name]
-    target_msgs = [msg for msg in msgs if msg.author == target_name]
-
-    your_words_cnt = stools.get_words_countered(your_msgs)
-    target_words_cnt = stools.get_words_countered(target_msgs)
+    ctx = _get_context(msgs)
+    your_words_cnt = ctx.words_countered(your_name)
+    target_words_cnt = ctx.words_countered(target_name)
 
-    words.sort(key=lambda w: your_words_cnt[w] + target_words_cnt[w], reverse=True)
-    df_dict = {"name": [], "word": [], "num": []}
-    for word in words[:topn]:
-        df_dict["word"].extend([word, word])
-        df_dict["name"].append(your_name)
-        df_dict["num"].append(your_words_cnt[word])
-        df_dict["name"].append(target_name)
-        df_dict["num"].append(target_words_cnt[word])
+    combined_cnt = your_words_cnt + target_words_cnt
+    top_words = heapq.nlargest(topn, words, key=lambda w: combined_cnt[w])
 
-    ax = sns.barplot(x="word", y="num", hue="name", data=pd.DataFrame(df_dict), palette="PuBu")
+    ax = _barplot_pair(top_words, [your_words_cnt[w] for w in top_words], [target_words_cnt[w] for w in top_words],
+                       your_name, target_name)
     ax.legend(ncol=1, loc="upper right", frameon=True)
     ax.set(ylabel="messages", xlabel='')
 
     fig = plt.gcf()
     fig.set_size_inches(14, 8)
 
-    fig.savefig(os.path.join(path_to_save, barplot_words.__name__ + ".png"), dpi=500)
+    fig.savefig(os.path.join(path_to_save, barplot_words.__name__ + ".png"), dpi=SAVE_DPI)
     # plt.show()
     log_line(f"{barplot_words.__name__} was created.")
     plt.close("all")
@@ -348,24 +526,15 @@ def barplot_words(msgs, your_name, target_name, words, topn, path_to_save):
 def barplot_emojis(msgs, your_name, target_name, topn, path_to_save):
     sns.set(style="whitegrid")
 
-    mc_emojis = stools.get_emoji_countered(msgs).most_common(topn)
+    ctx = _get_context(msgs)
+    mc_emojis = ctx.emoji_countered().most_common(topn)
     if not mc_emojis:
         return
-    your_msgs = [msg for msg in msgs if msg.author == your_name]
-    target_msgs = [msg for msg in msgs if msg.author == target_name]
+    your_emojis_cnt = ctx.emoji_countered(your_name)
+    target_emojis_cnt = ctx.emoji_countered(target_name)
 
-    your_emojis_cnt = stools.get_emoji_countered(your_msgs)
-    target_emojis_cnt = stools.get_emoji_countered(target_msgs)
-
-    df_dict = {"name": [], "emoji": [], "num": []}
-    for e, _ in mc_emojis:
-        df_dict["emoji"].extend([emoji.demojize(e), emoji.demojize(e)])
-        df_dict["name"].append(your_name)
-        df_dict["num"].append(your_emojis_cnt[e])
-        df_dict["name"].append(target_name)
-        df_dict["num"].append(target_emojis_cnt[e])
-
-    ax = sns.barplot(x="num", y="emoji", hue="name", data=pd.DataFrame(df_dict), palette="PuBu")
+    ax = _barplot_pair([emoji.demojize(e) for e, _ in mc_emojis], [your_emojis_cnt[e] for e, _ in mc_emojis],
+                       [target_emojis_cnt[e] for e, _ in mc_emojis], your_name, target_name, horizontal=True)
     ax.set(ylabel="emoji name", xlabel="emojis")
     ax.legend(ncol=1, loc="lower right", frameon=True)
 
@@ -373,7 +542,7 @@ def barplot_emojis(msgs, your_name, target_name, topn, path_to_save):
     fig.set_size_inches(11, 8)
     plt.tight_layout()
 
-    fig.savefig(os.path.join(path_to_save, barplot_emojis.__name__ + ".png"), dpi=500)
+    fig.savefig(os.path.join(path_to_save, barplot_emojis.__name__ + ".png"), dpi=SAVE_DPI)
     # plt.show()
     log_line(f"{barplot_emojis.__name__} was created.")
     plt.close("all")
@@ -382,16 +551,15 @@ def barplot_emojis(msgs, your_name, target_name, topn, path_to_save):
 def barplot_messages_per_weekday(msgs, your_name, target_name, path_to_save):
     sns.set(style="whitegrid", palette="pastel")
 
-    messages_per_weekday = stools.get_messages_per_weekday(msgs)
+    # 1970-01-01 was Thursday, so Monday is 0 (as datetime.weekday() has it).
+    ctx = _get_context(msgs)
+    weekdays = (ctx.days.astype(np.int64) + 3) % 7
+    is_target = ctx.is_author(target_name)
     labels = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 
-    ax = sns.barplot(x=labels, y=[len(weekday) for weekday in messages_per_weekday.values()],
-                     label=your_name, color="b")
+    ax = sns.barplot(x=labels, y=np.bincount(weekdays, minlength=7), label=your_name, color="b")
     sns.set_color_codes("muted")
-    sns.barplot(x=labels,
-                y=[len([msg for msg in weekday if msg.author == target_name])
-                   for weekday in messages_per_weekday.values()],
-                label=target_name, color="b")
+    sns.barplot(x=labels, y=np.bincount(weekdays[is_target], minlength=7), label=target_name, color="b")
 
     ax.legend(ncol=2, loc="lower right", frameon=True)
     ax.set(ylabel="messages")
@@ -400,16 +568,32 @@ def barplot_messages_per_weekday(msgs, your_name, target_name, path_to_save):
     fig = plt.gcf()
     fig.set_size_inches(11, 8)
 
-    fig.savefig(os.path.join(path_to_save, barplot_messages_per_weekday.__name__ + ".png"), dpi=500)
+    fig.savefig(os.path.join(path_to_save, barplot_messages_per_weekday.__name__ + ".png"), dpi=SAVE_DPI)
     # plt.show()
     log_line(f"{barplot_messages_per_weekday.__name__} was created.")
     plt.close("all")
 
 
+def _barplot_histogram(counts, bins):
+    """Draws precomputed histogram counts the way a seaborn distplot (without kde) does.
+
+    Args:
+        counts (numpy array): Values of the bins.
+        bins (list/numpy array of ints): Edges of the bins (one more than the counts).
+
+    Returns:
+        Axes object.
+    """
+    ax = plt.gca()
+    ax.bar(bins[:-1], counts, width=np.diff(bins), align="edge", color="m", alpha=0.4)
+    return ax
+
+
 def distplot_messages_per_hour(msgs, path_to_save):
     sns.set(style="whitegrid")
 
-    ax = sns.distplot([msg.date.hour for msg in msgs], bins=range(25), color="m", kde=False)
+    hours = _get_context(msgs).dates.astype("datetime64[h]").astype(np.int64) % 24
+    ax = _barplot_histogram(np.bincount(hours, minlength=24), np.arange(25))
     ax.set_xticklabels(stools.get_hours())
     ax.set(xlabel="hour", ylabel="messages")
     ax.margins(x=0)
@@ -419,7 +603,7 @@ def distplot_messages_per_hour(msgs, path_to_save):
     fig = plt.gcf()
     fig.set_size_inches(11, 8)
 
-    fig.savefig(os.path.join(path_to_save, distplot_messages_per_hour.__name__ + ".png"), dpi=500)
+    fig.savefig(os.path.join(path_to_save, distplot_messages_per_hour.__name__ + ".png"), dpi=SAVE_DPI)
     # plt.show()
     log_line(f"{distplot_messages_per_hour.__name__} was created.")
     plt.close("all")
@@ -428,18 +612,17 @@ def distplot_messages_per_hour(msgs, path_to_save):
 def distplot_messages_per_day(msgs, path_to_save):
     sns.set(style="whitegrid")
 
-    data = stools.get_messages_per_day(msgs)
-
-    max_day_len = len(max(data.values(), key=len))
-    ax = sns.distplot([len(day) for day in data.values()], bins=list(range(0, max_day_len, 50)) + [max_day_len],
-                      color="m", kde=False)
+    day_lens = _get_context(msgs).day_counts
+    max_day_len = int(day_lens.max())
+    bins = list(range(0, max_day_len, 50)) + [max_day_len]
+    ax = _barplot_histogram(np.histogram(day_lens, bins=bins)[0], bins)
     ax.set(xlabel="messages", ylabel="days")
     ax.margins(x=0)
 
     fig = plt.gcf()
     fig.set_size_inches(11, 8)
 
-    fig.savefig(os.path.join(path_to_save, distplot_messages_per_day.__name__ + ".png"), dpi=500)
+    fig.savefig(os.path.join(path_to_save, distplot_messages_per_day.__name__ + ".png"), dpi=SAVE_DPI)
     # plt.show()
     log_line(f"{distplot_messages_per_day.__name__} was created.")
     plt.close("all")
@@ -448,11 +631,12 @@ def distplot_messages_per_day(msgs, path_to_save):
 def distplot_messages_per_month(msgs, path_to_save):
     sns.set(style="whitegrid")
 
-    start_date = msgs[0].date.date()
-    (xticks, xticks_labels, xlabel) = _get_xticks(msgs)
+    _, _, xticks, xticks_labels, xlabel = _get_context(msgs).plot_axes()
 
-    ax = sns.distplot([(msg.date.date() - start_date).days for msg in msgs],
-                      bins=xticks + [(msgs[-1].date.date() - start_date).days], color="m", kde=False)
+    days = _get_context(msgs).days
+    days = (days - days[0]).astype(np.int64)
+    bins = xticks + [int(days[-1])]
+    ax = _barplot_histogram(np.histogram(days, bins=bins)[0], bins)
     ax.set_xticklabels(xticks_labels)
     ax.set(xlabel=xlabel, ylabel="messages")
     ax.margins(x=0)
@@ -462,7 +646,7 @@ def distplot_messages_per_month(msgs, path_to_save):
     fig = plt.gcf()
     fig.set_size_inches(11, 8)
 
-    fig.savefig(os.path.join(path_to_save, distplot_messages_per_month.__name__ + ".png"), dpi=500)
+    fig.savefig(os.path.join(path_to_save, distplot_messages_per_month.__name__ + ".png"), dpi=SAVE_DPI)
     # plt.show()
     log_line(f"{distplot_messages_per_month.__name__} was created.")
     plt.close("all")
@@ -471,10 +655,16 @@ def distplot_messages_per_month(msgs, path_to_save):
 def lineplot_message_length(msgs, your_name, target_name, path_to_save):
     sns.set(style="whitegrid")
 
-    (x, y_total), (xticks, xticks_labels, xlabel) = _get_plot_data(msgs), _get_xticks(msgs)
+    ctx = _get_context(msgs)
+    x, periods, xticks, xticks_labels, xlabel = ctx.plot_axes()
 
-    y_your = [avg([len(msg.text) for msg in period if msg.author == your_name]) for period in y_total]
-    y_target = [avg([len(msg.text) for msg in period if msg.author == target_name]) for period in y_total]
+    lengths = ctx.columns["text_len"]
+    is_your, is_target = ctx.is_author(your_name), ctx.is_author(target_name)
+    # an average length of the messages in each period (0 for periods without messages)
+    y_your = (np.bincount(periods[is_your], weights=lengths[is_your], minlength=len(x)) /
+              np.maximum(np.bincount(periods[is_your], minlength=len(x)), 1))
+    y_target = (np.bincount(periods[is_target], weights=lengths[is_target], minlength=len(x)) /
+                np.maximum(np.bincount(periods[is_target], minlength=len(x)), 1))
 
     plt.fill_between(x, y_your, alpha=0.3)
     ax = sns.lineplot(x=x, y=y_your, palette="denim blue", linewidth=2.5, label=your_name)
@@ -492,7 +682,7 @@ def lineplot_message_length(msgs, your_name, target_name, path_to_save):
     fig = plt.gcf()
     fig.set_size_inches(13, 7)
 
-    fig.savefig(os.path.join(path_to_save, lineplot_message_length.__name__ + ".png"), dpi=500)
+    fig.savefig(os.path.join(path_to_save, lineplot_message_length.__name__ + ".png"), dpi=SAVE_DPI)
     # plt.show()
     plt.close("all")
     log_line(f"{lineplot_message_length.__name__} was created.")
@@ -501,10 +691,11 @@ def lineplot_message_length(msgs, your_name, target_name, path_to_save):
 def lineplot_messages(msgs, your_name, target_name, path_to_save):
     sns.set(style="whitegrid")
 
-    (x, y_total), (xticks, xticks_labels, xlabel) = _get_plot_data(msgs), _get_xticks(msgs)
+    ctx = _get_context(msgs)
+    x, periods, xticks, xticks_labels, xlabel = ctx.plot_axes()
 
-    y_your = [len([msg for msg in period if msg.author == your_name]) for period in y_total]
-    y_target = [len([msg for msg in period if msg.author == target_name]) for period in y_total]
+    y_your = np.bincount(periods[ctx.is_author(your_name)], minlength=len(x))
+    y_target = np.bincount(periods[ctx.is_author(target_name)], minlength=len(x))
 
     plt.fill_between(x, y_your, alpha=0.3)
     ax = sns.lineplot(x=x, y=y_your, palette="denim blue", linewidth=2.5, label=your_name)
@@ -522,34 +713,22 @@ def lineplot_messages(msgs, your_name, target_name, path_to_save):
     fig = plt.gcf()
     fig.set_size_inches(13, 7)
 
-    fig.savefig(os.path.join(path_to_save, lineplot_messages.__name__ + ".png"), dpi=500)
+    fig.savefig(os.path.join(path_to_save, lineplot_messages.__name__ + ".png"), dpi=SAVE_DPI)
     # plt.show()
     plt.close("all")
     log_line(f"{lineplot_messages.__name__} was created.")
 
 
 def wordcloud(msgs, words, path_to_save):
-    all_words_list = []
-    words_cnt = stools.get_words_countered(msgs)
-    # we need to create a huge string which contains each word as many times as it encounters in messages.
-    for word in set(words):
-        all_words_list.extend([word] * (words_cnt[word]))
-    random.shuffle(all_words_list, random.random)  # don't forget to shuffle !
-
-    if not all_words_list:
+    words_cnt = _get_context(msgs).words_countered()
+    frequencies = {word: words_cnt[word] for word in set(words) if words_cnt[word]}
+
+    if not frequencies:
         log_line("No such words were found in message history.")
         return
 
-    all_words_string = ' '.join(all_words_list)
-
-    # the cloud will be a circle.
-    radius = 500
-    x, y = np.ogrid[:2 * radius, :2 * radius]
-    mask = (x - radius) ** 2 + (y - radius) ** 2 > radius ** 2
-    mask = 255 * mask.astype(int)
-
-    word_cloud = wc.WordCloud(background_color="white", repeat=False, mask=mask)
-    word_cloud.generate(all_words_string)
+    word_cloud = wc.WordCloud(background_color="white", repeat=False, mask=_wordcloud_mask)
+    word_cloud.generate_from_frequencies(frequencies)
 
     plt.axis("off")
     plt.imshow(word_cloud, interpolation="bilinear")
@@ -26,10 +26,14 @@ async def get_str_dialogs(client=None, loop=None):
     return [f"{dialog.name} (id={dialog.id})" for dialog in await _get_dialogs(client, loop)]
 
 
-async def get_sign_in_results(api_id, api_hash, code, phone_number, password, session_name, loop=None):
+async def get_sign_in_results(api_id, api_hash, code, phone_number, password, session_name, loop=None,
+                              client_cache=None):
     """Tries to sign-in in Telegram with given parameters.
 
-    Notes: Automatically creates .session file for further sign-ins.
+    Notes:
+        Automatically creates .session file for further sign-ins.
+        If client_cache is given, a connected client is stored there under the "client" key and is reused by the
+        following calls with the same session name, API id and hash. Such a client is not disconnected.
 
     Args:
         api_id (str/int): Telegram API id.
@@ -39,13 +43,24 @@ async def get_sign_in_results(api_id, api_hash, code, phone_number, password, se
         password (str): 2FA password (if needed).
         session_name (str): A name of the current session.
         loop (asyncio.windows_events._WindowsSelectorEventLoop, optional): An event loop.
+        client_cache (dict, optional): A storage for the client between sign-in attempts.
 
     Returns:
         A string describing the results of sign-in.
     """
+    key = (session_name, api_id, api_hash)
+    client = None
+    if client_cache is not None:
+        if client_cache.get("key") == key and client_cache["client"].is_connected():
+            client = client_cache["client"]
+        else:
+            await disconnect_cached_client(client_cache)
     try:
-        client = TelegramClient(session_name, api_id, api_hash, loop=loop)
-        await client.connect()
+        if client is None:
+            client = TelegramClient(session_name, api_id, api_hash, loop=loop)
+            await client.connect()
+            if client_cache is not None:
+                client_cache["key"], client_cache["client"] = key, client
     except (ApiIdInvalidError, ValueError):
         log_line("Unsuccessful sign-in! Wrong API.")
         return "wrong api"
@@ -77,12 +92,20 @@ async def get_sign_in_results(api_id, api_hash, code, phone_number, password, se
         log_line(f'Unsuccessful sign-in! {err.message}')
         return f'need wait for {err.seconds}'
     finally:
-        if client.is_connected():
+        if client_cache is None and client.is_connected():
             await client.disconnect()
     log_line("Successful sign-in.")
     return "success"
 
 
+async def disconnect_cached_client(client_cache):
+    """Disconnects and forgets a client stored by get_sign_in_results (if there is one)."""
+    client = client_cache.pop("client", None)
+    client_cache.pop("key", None)
+    if client is not None and client.is_connected():
+        await client.disconnect()
+
+
 async def get_telegram_messages(your_name, target_name, loop=None, target_id=None, num=1000000):
     """Retrieves a list of messages from Telegram dialogue.
 
@@ -106,32 +129,62 @@ async def get_telegram_messages(your_name, target_name, loop=None, target_id=Non
             target_id = await _get_target_dialog_id(client)
         target_entity = await client.get_entity(target_id)
         log_line("Receiving Telegram messages...")
-        telethon_messages = await _retrieve_messages(client, target_entity, num)
-        messages = [_telethon_msg_to_mymessage(msg, target_id, your_name, target_name) for msg in telethon_messages]
+        messages = await _retrieve_messages(client, target_entity, num, target_id, your_name, target_name)
         log_line(f"{len(messages)} Telegram messages were received")
         return messages
 
 
-async def _retrieve_messages(client, target_entity, num):
-    """Retrieves messages from client's target_entity batch by batch and return them all."""
-    batch_size = min(3000, num)
-    msgs = []
-    batch = await client.get_messages(target_entity, limit=batch_size)
-    while len(batch) and len(msgs) < num:
-        offset_id = batch[-1].id
-        msgs.extend([msg for msg in batch if isinstance(msg, Message)])
-        try:
-            batch = await asyncio.wait_for(client.get_messages(target_entity, limit=min(batch_size, num - len(msgs)), offset_id=offset_id), 10*60)
-        except ConnectionError:
-            log_line("Internet connection was lost.")
-            raise
-        except asyncio.TimeoutError:
-            log_line("Telegram timeout error.")
-            break
-        if not len(batch):
-            log_line(f"{len(msgs[:num])} (100%) messages received.")
-        else:
-            log_line(f"{len(msgs[:num])} ({len(msgs[:num])/batch.total*100:.2f}%) messages received.")
+async def _retrieve_messages(client, target_entity, num, target_id, your_name, target_name):
+    """Retrieves messages from client's target_entity and returns them all (as MyMessage objects).
+
+    Notes:
+        The range of message ids up to the newest one is split evenly into as many windows as batches of batch_size
+        messages the dialogue has. Ids of a private dialogue are shared with other dialogues of the account, so they
+        are sparse and windows may hold very different numbers of messages (each one is limited by num only).
+        Windows are retrieved concurrently, no more than 4 at a time (to avoid flood waits).
+        If a window times out, it and all the older windows are dropped (no more of them are requested), so the
+        result is a contiguous range of the newest messages, just like retrieving them batch by batch gives.
+        Each message is transformed to MyMessage as soon as it is received, so heavy telethon objects are not kept.
+    """
+    batch_size = 3000
+    newest = await client.get_messages(target_entity, limit=1)
+    if not len(newest):
+        return []
+    total = min(newest.total, num)
+    windows_num = -(-newest.total // batch_size)
+    bounds = [newest[0].id * (windows_num - i) // windows_num for i in range(windows_num + 1)]
+    semaphore = asyncio.Semaphore(4)
+    received = 0
+    first_failed = windows_num  # an index of the newest window which has timed out
+
+    async def collect(messages):
+        return [_telethon_msg_to_mymessage(msg, target_id, your_name, target_name)
+                async for msg in messages if isinstance(msg, Message)]
+
+    async def fetch(i, max_id, min_id):
+        nonlocal received, first_failed
+        async with semaphore:
+            if i > first_failed:
+                return []
+            try:
+                # max_id and min_id are exclusive, so the window is (min_id; max_id].
+                batch = await asyncio.wait_for(collect(client.iter_messages(target_entity, limit=num,
+                                                                            max_id=max_id + 1, min_id=min_id)),
+                                               10*60)
+            except ConnectionError:
+                log_line("Internet connection was lost.")
+                raise
+            except asyncio.TimeoutError:
+                log_line("Telegram timeout error.")
+                first_failed = min(first_failed, i)
+                return []
+        received = min(received + len(batch), total)
+        log_line(f"{received} ({received/total*100:.2f}%) messages received.")
+        return batch
+
+    batches = await asyncio.gather(*(fetch(i, max_id, min_id)
+                                     for i, (max_id, min_id) in enumerate(zip(bounds, bounds[1:]))))
+    msgs = [msg for batch in batches[:first_failed] for msg in batch]
     return msgs[:num][::-1]
 
 
@@ -189,15 +242,15 @@ def _telethon_msg_to_mymessage(msg, target_id, your_name, target_name):
     Returns:
         MyMessage obj.
     """
-    return MyMessage(msg.message + (msg.sticker.attributes[1].alt if msg.sticker is not None else ''),
-                     msg.date.replace(tzinfo=None) + relativedelta(hours=time_offset(msg.date)),
+    sticker, document, date = msg.sticker, msg.document, msg.date
+    mime_type = document.mime_type if document is not None else None
+    return MyMessage(msg.message + (sticker.attributes[1].alt if sticker is not None else ''),
+                     date.replace(tzinfo=None) + relativedelta(hours=time_offset(date)),
                      target_name if msg.from_id == target_id else your_name,
                      is_forwarded=msg.forward is not None,
-                     document_id=msg.document.id if msg.document is not None else None,
-                     has_sticker=msg.sticker is not None,
+                     document_id=document.id if document is not None else None,
+                     has_sticker=sticker is not None,
                      has_video=msg.video is not None,
-                     has_voice=(msg.voice is not None and
-                                msg.document.mime_type == "audio/ogg"),
-                     has_audio=(msg.audio is not None and
-                                msg.document.mime_type != "audio/ogg"),  # let audio != voice
+                     has_voice=msg.voice is not None and mime_type == "audio/ogg",
+                     has_audio=msg.audio is not None and mime_type != "audio/ogg",  # let audio != voice
                      has_photo=msg.photo is not None)
@@ -5,18 +5,51 @@ import configparser
 from message_analyser.myMessage import MyMessage
 from message_analyser.misc import log_line
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_DIALOG_ID_RE = re.compile(r"\(id=([0-9]+)\)$")  # see telegram.get_str_dialogs
+
 
 def _get_config_file_name():
     return os.path.join(os.path.split(os.path.normpath(os.path.dirname(__file__)))[0], "config.ini")
 
 
+_config_cache = dict()
+
+
+def _get_config_file_key(config_file_name):
+    try:
+        return config_file_name, os.stat(config_file_name).st_mtime_ns
+    except OSError:
+        return config_file_name, None
+
+
+def _get_config_parser(config_file_name):
+    """Gets a ConfigParser of the config file. The file is read again only if it was changed since the last call."""
+    key = _get_config_file_key(config_file_name)
+    if _config_cache.get("key") != key:
+        config_parser = configparser.ConfigParser()
+        config_parser.read(config_file_name, encoding="utf-8-sig")
+        _config_cache["key"], _config_cache["parser"] = key, config_parser
+    return _config_cache["parser"]
+
+
+def _store_config_parser(config_parser, config_file_name):
+    with open(config_file_name, "w+", encoding="utf-8") as config_file:
+        config_parser.write(config_file)
+    _config_cache["key"], _config_cache["parser"] = _get_config_file_key(config_file_name), config_parser
+
+
 def store_session_params(params):
     config_file_name = _get_config_file_name()
-    config_parser = configparser.ConfigParser()
-    config_parser.read(config_file_name, encoding="utf-8-sig")
+    config_parser = _get_config_parser(config_file_name)
     assert params["from_vk"] or params["from_telegram"]
     config_parser.set("session_params", "dialog_id",
-                      re.compile("\(id=[0-9]+\)$").search(params["dialogue"]).group()[4:-1] if params["from_telegram"]
+                      _DIALOG_ID_RE.search(params["dialogue"]).group(1) if params["from_telegram"]
                       else "")
     config_parser.set("session_params", "vkopt_file", params["vkopt_file"] if params["from_vk"] else "")
     config_parser.set("session_params", "words_file", params["words_file"] if params["plot_words"] else "")
@@ -24,15 +57,13 @@ def store_session_params(params):
     assert params["your_name"] and params["target_name"]
     config_parser.set("session_params", "your_name", params["your_name"])
     config_parser.set("session_params", "target_name", params["target_name"])
-    with open(config_file_name, "w+", encoding="utf-8") as config_file:
-        config_parser.write(config_file)
+    _store_config_parser(config_parser, config_file_name)
     log_line(f"Session parameters were stored in {config_file_name} file.")
 
 
 def get_session_params():
     config_file_name = _get_config_file_name()
-    config_parser = configparser.ConfigParser()
-    config_parser.read(config_file_name, encoding="utf-8-sig")
+    config_parser = _get_config_parser(config_file_name)
     dialog_id = config_parser.get("session_params", "dialog_id", fallback="")
     dialog_id = int(dialog_id) if dialog_id else -1
     vkopt_file = config_parser.get("session_params", "vkopt_file", fallback="")
@@ -45,21 +76,18 @@ def get_session_params():
 
 def store_telegram_secrets(api_id, api_hash, phone_number, session_name="Message retriever"):
     config_file_name = _get_config_file_name()
-    config_parser = configparser.ConfigParser()
-    config_parser.read(config_file_name, encoding="utf-8-sig")
+    config_parser = _get_config_parser(config_file_name)
     config_parser.set("telegram_secrets", "api_id", api_id)
     config_parser.set("telegram_secrets", "api_hash", api_hash)
     config_parser.set("telegram_secrets", "session_name", session_name)
     config_parser.set("telegram_secrets", "phone_number", phone_number)
-    with open(config_file_name, "w+", encoding="utf-8") as config_file:
-        config_parser.write(config_file)
+    _store_config_parser(config_parser, config_file_name)
     log_line(f"Telegram secrets were stored in {config_file_name} file.")
 
 
 def get_telegram_secrets():
     config_file_name = _get_config_file_name()
-    config_parser = configparser.ConfigParser()
-    config_parser.read(config_file_name, encoding="utf-8-sig")
+    config_parser = _get_config_parser(config_file_name)
     api_id = config_parser.get("telegram_secrets", "api_id", fallback="")
     api_hash = config_parser.get("telegram_secrets", "api_hash", fallback="")
     phone_number = config_parser.get("telegram_secrets", "phone_number", fallback="")
@@ -68,9 +96,23 @@ def get_telegram_secrets():
     return api_id, api_hash, phone_number, session_name
 
 
+_msgs_batch_size = 10000  # messages are serialized and written by batches of this size
+
+
+def _dumps(obj):
+    """Serializes obj to JSON bytes (without line breaks)."""
+    if orjson is not None:
+        # dates are written by str() (like json does below), not in orjson's own ISO format.
+        return orjson.dumps(obj, default=str, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(obj, default=str).encode()
+
+
 def store_msgs(file_path, msgs):
-    with open(file_path, 'w') as fp:
-        json.dump(msgs, fp, default=str)
+    """Stores messages as newline-delimited JSON (one message per line)."""
+    with open(file_path, 'wb') as fp:
+        for i in range(0, len(msgs), _msgs_batch_size):
+            # a single write per batch (json.dump writes each chunk of the output separately)
+            fp.write(b''.join(_dumps(msg.to_dict()) + b'\n' for msg in msgs[i:i + _msgs_batch_size]))
     log_line(f"{len(msgs)} messages were stored in {file_path} file.")
 
 
@@ -81,16 +123,26 @@ def store_top_words_count(words, your_words_cnt, target_words_cnt, file_path):
             fp.write(f"{word}, {your_words_cnt[word]}, {target_words_cnt[word]}, "
                      f"{your_words_cnt[word]+target_words_cnt[word]}\n")
 
+
 def get_msgs(file_path):
-    with open(file_path, 'r') as f:
-        msgs = [MyMessage.from_dict(msg) for msg in json.loads(f.read())]
+    """Gets messages stored by store_msgs.
+
+    Notes:
+        Files with a single JSON list of messages (stored by the former versions) are read as well.
+    """
+    loads = (orjson or json).loads
+    with open(file_path, 'rb') as f:
+        if f.peek(1)[:1] == b'[':  # the former format
+            msgs = [MyMessage.from_dict(msg) for msg in loads(f.read())]
+        else:
+            msgs = [MyMessage.from_dict(loads(line)) for line in f if not line.isspace()]
     log_line(f"{len(msgs)} messages were received from {file_path} file.")
     return msgs
 
 
 def get_words(file_path):
     with open(file_path, 'r', encoding="utf-8-sig") as f:
-        words = [word.strip() for word in f.readlines()
-                 if all([ch.isalpha() or ch == '\'' or ch == '`' for ch in word.strip()])]
+        words = [word for word in map(str.strip, f.read().splitlines())
+                 if word and all(ch.isalpha() or ch == '\'' or ch == '`' for ch in word)]
     log_line(f"{len(words)} words were received from {file_path} file.")
     return words
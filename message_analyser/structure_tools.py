@@ -1,6 +1,11 @@
+import re
+import sys
 import emoji
 import datetime
+import functools
 import itertools
+import numpy as np
+from operator import attrgetter
 from collections import Counter
 from dateutil.relativedelta import relativedelta
 
@@ -9,10 +14,73 @@ MAX_MSG_LEN = 4096
 
 def count_months(msgs):
     """Returns the number of months between first and last messages (calendar months)."""
-    r = relativedelta(msgs[-1].date, msgs[0].date)
+    return count_months_between(msgs[0].date, msgs[-1].date)
+
+
+def count_months_between(start, end):
+    """Returns the number of calendar months between two datetime objects."""
+    r = relativedelta(end, start)
     return r.months + 12 * r.years
 
 
+_column_flags = ("is_forwarded", "is_link", "has_photo", "has_sticker", "has_audio", "has_voice", "has_video")
+
+
+def get_columns(msgs, target_name=None):
+    """Gets attributes of messages as numpy arrays (one array per attribute, one element per message).
+
+    Notes:
+        Messages are walked through only once, all the further statistics are computed by numpy.
+
+    Args:
+        msgs (list of MyMessage objects): Messages.
+        target_name (str, optional): Target's name (is_target is all False if it isn't given).
+
+    Returns:
+        A dictionary such as:
+            {
+                "date": numpy array of dates (datetime64[us], see get_dates),
+                "is_target": numpy bool array (True for the target's messages),
+                "text_len": numpy int array of the texts lengths,
+                "is_forwarded", "is_link", "has_photo", "has_sticker", "has_audio", "has_voice", "has_video":
+                    numpy bool arrays of the same attributes of messages
+            }
+    """
+    get_flags = attrgetter(*_column_flags)
+    table = np.array([(msg.author == target_name, len(msg.text)) + get_flags(msg) for msg in msgs],
+                     dtype=np.int64).reshape(-1, 2 + len(_column_flags))
+    columns = {"date": get_dates(msgs),
+               "is_target": table[:, 0].astype(bool),
+               "text_len": table[:, 1]}
+    for i, flag in enumerate(_column_flags, 2):
+        columns[flag] = table[:, i].astype(bool)
+    return columns
+
+
+def get_authors_coded(msgs):
+    """Codes authors of messages by integers.
+
+    Notes:
+        Authors are coded in order of their first occurrence.
+
+    Args:
+        msgs (list of MyMessage objects): Messages.
+
+    Returns:
+        A tuple such as:
+            (list of authors names (author's code is its index),
+             numpy int array of codes of the messages authors).
+    """
+    names = dict()
+    codes = np.fromiter((names.setdefault(msg.author, len(names)) for msg in msgs), dtype=np.int64, count=len(msgs))
+    return list(names), codes
+
+
+def get_dates(msgs):
+    """Gets dates of messages as a numpy datetime64[us] array (the same precision as datetime objects have)."""
+    return np.array([msg.date for msg in msgs], dtype="datetime64[us]")
+
+
 def get_filtered(msgs,
                  remove_empty=False,
                  remove_links=False,
@@ -43,17 +111,18 @@ def get_filtered(msgs,
         A list of MyMessage objects.
     """
     if except_patterns is not None:
-        except_patterns = set(pattern.lower() for pattern in except_patterns)
+        except_patterns = set(frozenset(ch.lower() for ch in pattern) for pattern in except_patterns)
     if except_samples is not None:
-        except_samples = list(sample.lower() for sample in except_samples)
-    return list(filter(lambda msg:
-                       (not remove_empty or msg.text != "")
-                       and min_len <= len(msg.text) <= max_len
-                       and not (remove_forwards and msg.is_forwarded)
-                       and not (remove_links and msg.is_link)
-                       and (except_patterns is None or not any(set(msg.text.lower()) == p for p in except_patterns))
-                       and (except_samples is None or not any(sample == msg.text for sample in except_samples)),
-                       msgs))
+        except_samples = frozenset(sample.lower() for sample in except_samples)
+    check_patterns = except_patterns is not None
+    check_samples = except_samples is not None
+    return [msg for msg in msgs
+            if (not remove_empty or msg.text != "")
+            and min_len <= len(msg.text) <= max_len
+            and not (remove_forwards and msg.is_forwarded)
+            and not (remove_links and msg.is_link)
+            and (not check_patterns or frozenset(msg.text.lower()) not in except_patterns)
+            and (not check_samples or msg.text.lower() not in except_samples)]
 
 
 def get_non_text_messages_grouped(groups):
@@ -71,20 +140,15 @@ def get_non_text_messages_grouped(groups):
             }
         ]
     """
-    return [
-        {"groups": [len(list(filter(lambda m: m.has_audio, group))) for group in groups],
-         "type": "audio"},
-        {"groups": [len(list(filter(lambda m: m.has_voice, group))) for group in groups],
-         "type": "voice"},
-        {"groups": [len(list(filter(lambda m: m.has_photo, group))) for group in groups],
-         "type": "photo"},
-        {"groups": [len(list(filter(lambda m: m.has_video, group))) for group in groups],
-         "type": "video"},
-        {"groups": [len(list(filter(lambda m: m.has_sticker, group))) for group in groups],
-         "type": "sticker"},
-        {"groups": [len(list(filter(lambda m: m.is_link, group))) for group in groups],
-         "type": "link"}
-    ]
+    types = ("audio", "voice", "photo", "video", "sticker", "link")
+    get_flags = attrgetter("has_audio", "has_voice", "has_photo", "has_video", "has_sticker", "is_link")
+    # one row of flags per message (messages of all the groups in a row), one column per type
+    flags = np.array([get_flags(msg) for group in groups for msg in group], dtype=np.int64).reshape(-1, len(types))
+    sums = np.concatenate((np.zeros((1, len(types)), dtype=np.int64), flags.cumsum(axis=0)))
+    ends = np.cumsum(np.array([len(group) for group in groups], dtype=np.int64))
+    starts = np.concatenate(([0], ends[:-1])).astype(np.int64)
+    counts = sums[ends] - sums[starts]  # empty groups give 0
+    return [{"groups": type_counts, "type": msg_type} for type_counts, msg_type in zip(counts.T.tolist(), types)]
 
 
 def get_response_speed_per_timedelta(msgs, name):
@@ -116,13 +180,31 @@ def get_response_speed_per_timedelta(msgs, name):
     return res
 
 
-def get_messages_per_timedelta(msgs, time_bin):
+def _group_by_indices(msgs, indices, keys):
+    """Groups messages by the indices of their groups (keys[i] is the key of the i-th group).
+
+    Notes:
+        Messages keep their order within each group. Every key gets a list, even an empty one.
+    """
+    order = np.argsort(indices, kind="stable")
+    ends = np.cumsum(np.bincount(indices, minlength=len(keys))).tolist()
+    ordered = [msgs[i] for i in order.tolist()]
+    return {key: ordered[start:end] for key, start, end in zip(keys, [0] + ends, ends)}
+
+
+def _get_weekdays(days):
+    """Gets days of the week (Monday is 0) of a numpy datetime64[D] array."""
+    return (days.astype(np.int64) + 3) % 7  # 1970-01-01 was Thursday
+
+
+def get_messages_per_timedelta(msgs, time_bin, dates=None):
     """Gets lists of messages for each time interval with a given length. For example:
     time_bin is 7, so we will get lists of messages for each week between the first and last messages.
 
     Args:
         msgs (list of MyMessage objects): Messages.
         time_bin (int): The number of days in each bin (time interval).
+        dates (numpy datetime64 array, optional): Dates of msgs (see get_dates), are taken from msgs if not given.
 
     Returns:
         A dictionary such as:
@@ -130,16 +212,8 @@ def get_messages_per_timedelta(msgs, time_bin):
                 day (datetime.date object): a list of messages within interval [day, day + time_bin)
             }
     """
-    start_d = msgs[0].date.date()
-    current_date = start_d
-    end_d = msgs[-1].date.date()
-    res = dict()
-    while current_date <= end_d:
-        res[current_date] = []
-        current_date += relativedelta(days=time_bin)
-    for msg in msgs:
-        res[start_d + relativedelta(days=(msg.date.date() - start_d).days // time_bin * time_bin)].append(msg)
-    return res
+    day_indices = _get_day_indices(msgs, dates)
+    return _group_by_indices(msgs, day_indices // time_bin, _get_days(msgs)[::time_bin])
 
 
 def get_months(msgs):
@@ -237,7 +311,7 @@ def date_months_to_str_months(months):
     return [str_month(month) for month in months]
 
 
-def get_messages_per_month(msgs):
+def get_messages_per_month(msgs, dates=None):
     """Gets lists of messages for each month between the first and last message.
 
     Notes:
@@ -245,6 +319,7 @@ def get_messages_per_month(msgs):
 
     Args:
         msgs (list of Mymessage objects): Messages.
+        dates (numpy datetime64 array, optional): Dates of msgs (see get_dates), are taken from msgs if not given.
 
     Returns:
         A dictionary such as:
@@ -252,23 +327,19 @@ def get_messages_per_month(msgs):
                 month (datetime.date): list of messages within this month
             }
     """
-    res = dict()
-    current_date = msgs[0].date.date().replace(day=1)
-    end_d = msgs[-1].date.date().replace(day=1)
-    while current_date <= end_d:
-        res[current_date] = []
-        current_date += relativedelta(months=1)
-
-    for msg in msgs:
-        res[msg.date.date().replace(day=1)].append(msg)
-    return res
+    if dates is None:
+        dates = get_dates(msgs)
+    months = dates.astype("datetime64[M]")
+    month_keys = np.arange(months[0], months[-1] + 1).astype("datetime64[D]").tolist()
+    return _group_by_indices(msgs, (months - months[0]).astype(np.int64), month_keys)
 
 
-def get_messages_per_week(msgs):
+def get_messages_per_week(msgs, dates=None):
     """Gets lists of messages for each calendar week between the first and the last message.
 
     Args:
         msgs (list of Mymessage objects): Messages.
+        dates (numpy datetime64 array, optional): Dates of msgs (see get_dates), are taken from msgs if not given.
 
     Returns:
         A dictionary such as:
@@ -276,26 +347,21 @@ def get_messages_per_week(msgs):
                 week (datetime.date): list of messages within this week
             }
     """
-    res = dict()
-    current_date = msgs[0].date.date()
-    end_d = msgs[-1].date.date()
-    if current_date.weekday() != 0:
-        current_date -= relativedelta(days=current_date.weekday())
-    while current_date <= end_d:
-        res[current_date] = []
-        current_date += relativedelta(days=7)
-
-    for msg in msgs:
-        res[msg.date.date() - relativedelta(days=msg.date.date().weekday())].append(msg)
-    return res
+    if dates is None:
+        dates = get_dates(msgs)
+    days = dates.astype("datetime64[D]")
+    weeks = days - _get_weekdays(days)  # Mondays of the weeks
+    week_keys = np.arange(weeks[0], days[-1] + 1, 7).tolist()
+    return _group_by_indices(msgs, (weeks - weeks[0]).astype(np.int64) // 7, week_keys)
 
 
-def get_messages_per_minutes(msgs, minutes):
+def get_messages_per_minutes(msgs, minutes, dates=None):
     """Gets lists of messages for each interval in minutes.
 
     Args:
         msgs (list of MyMessage objects): Messages.
         minutes (int): The number of minutes in one interval.
+        dates (numpy datetime64 array, optional): Dates of msgs (see get_dates), are taken from msgs if not given.
 
     Returns:
         A dictionary such as:
@@ -303,17 +369,18 @@ def get_messages_per_minutes(msgs, minutes):
                 minute: list off all messages sent within interval [minute, minute + minutes).
             }
     """
-    res = {i: [] for i in range(0, 24 * 60, minutes)}
-    for msg in msgs:
-        res[(msg.date.hour * 60 + msg.date.minute) // minutes * minutes].append(msg)
-    return res
+    if dates is None:
+        dates = get_dates(msgs)
+    day_minutes = (dates.astype("datetime64[m]") - dates.astype("datetime64[D]")).astype(np.int64)
+    return _group_by_indices(msgs, day_minutes // minutes, list(range(0, 24 * 60, minutes)))
 
 
-def get_messages_per_weekday(msgs):
+def get_messages_per_weekday(msgs, dates=None):
     """Gets lists of messages for each day of the week (7 lists in a dictionary total).
 
     Args:
         msgs (list of MyMessage objects): Messages.
+        dates (numpy datetime64 array, optional): Dates of msgs (see get_dates), are taken from msgs if not given.
 
     Returns:
         A dictionary such as:
@@ -321,40 +388,60 @@ def get_messages_per_weekday(msgs):
                 day_of_the_week (int 0-6): list off all messages sent on this day
             }
     """
-    res = {0: [], 1: [], 2: [], 3: [], 4: [], 5: [], 6: []}
-    for msg in msgs:
-        res[msg.date.weekday()].append(msg)
+    if dates is None:
+        dates = get_dates(msgs)
+    res = _group_by_indices(msgs, _get_weekdays(dates.astype("datetime64[D]")), list(range(7)))
     # placing Sunday at the end of the week # turned out we don't need it...
     # for i in [0, 1, 2, 3, 4, 5]:
     #     res[i], res[(i + 6) % 7] = res[(i + 6) % 7], res[i]
     return res
 
 
-def get_messages_per_day(msgs):
+def _get_day_indices(msgs, dates=None):
+    """Gets the number of the day (first message's day is 0) for each message."""
+    if dates is None:
+        dates = get_dates(msgs)
+    days = dates.astype("datetime64[D]")
+    return (days - days[0]).astype(np.int64)
+
+
+def _get_days(msgs):
+    """Gets all the days (datetime.date objects) between the first and the last message."""
+    start_d = msgs[0].date.date()
+    return [start_d + datetime.timedelta(days=i) for i in range((msgs[-1].date.date() - start_d).days + 1)]
+
+
+def get_messages_per_day(msgs, dates=None):
     """Gets lists of messages for each day between the first and the last message.
 
-    Notes:
-        Days are stored in a dictionary as integers (first day is 0, second is 1 etc).
+    Args:
+        msgs (list of MyMessage objects): Messages.
+        dates (numpy datetime64 array, optional): Dates of msgs (see get_dates), are taken from msgs if not given.
+
+    Returns:
+        A dictionary such as:
+            {
+                day (datetime.date): list of messages sent this day
+            }
+    """
+    return _group_by_indices(msgs, _get_day_indices(msgs, dates), _get_days(msgs))
+
+
+def get_messages_per_day_countered(msgs, dates=None):
+    """Counts messages for each day between the first and the last message.
 
     Args:
         msgs (list of MyMessage objects): Messages.
+        dates (numpy datetime64 array, optional): Dates of msgs (see get_dates), are taken from msgs if not given.
 
     Returns:
         A dictionary such as:
             {
-                day (int): list of messages sent this day
+                day (datetime.date): the number of messages sent this day
             }
     """
-    current_date = msgs[0].date.date()
-    end_d = msgs[-1].date.date()
-    res = dict()
-    one_day = relativedelta(days=1)
-    while current_date <= end_d:
-        res[current_date] = []
-        current_date += one_day
-    for msg in msgs:
-        res[msg.date.date()].append(msg)
-    return res
+    days = _get_days(msgs)
+    return dict(zip(days, np.bincount(_get_day_indices(msgs, dates), minlength=len(days)).tolist()))
 
 
 def get_hours():
@@ -362,11 +449,12 @@ def get_hours():
     return [f"{i:02d}:00" for i in range(24)]
 
 
-def get_messages_per_hour(msgs):
+def get_messages_per_hour(msgs, dates=None):
     """Gets lists of messages for each hour of the day (total 24 lists).
 
     Args:
         msgs (list of MyMessage objects): Messages.
+        dates (numpy datetime64 array, optional): Dates of msgs (see get_dates), are taken from msgs if not given.
 
     Returns:
         A dictionary such as:
@@ -374,32 +462,54 @@ def get_messages_per_hour(msgs):
                 hour (string "%H:00"): list of messages sent this hour (for all days)
             }
     """
-    res = {hour: [] for hour in get_hours()}
-    for msg in msgs:
-        res[f"{msg.date.hour:02d}:00"].append(msg)
-    return res
+    if dates is None:
+        dates = get_dates(msgs)
+    return _group_by_indices(msgs, dates.astype("datetime64[h]").astype(np.int64) % 24, get_hours())
 
 
-def get_longest_pause(msgs):
+def get_longest_pause(msgs, dates=None):
     """Gets the longest time distance between two consecutive messages.
 
     Args:
         msgs (list of MyMessage objects): Messages.
+        dates (numpy datetime64 array, optional): Dates of msgs (see get_dates), are taken from msgs if not given.
 
     Returns:
         A tuple such as:
             (timedelta of the longest pause in a dialogue, start datetime of the pause, end datetime of the pause).
     """
-    previous_date = msgs[0].date
-    max_delta = datetime.datetime.today() - datetime.datetime.today()
-    start_pause = end_pause = previous_date
-    for msg in msgs[1:]:
-        if msg.date - previous_date > max_delta:
-            start_pause = previous_date
-            end_pause = msg.date
-            max_delta = msg.date - previous_date
-        previous_date = msg.date
-    return max_delta, start_pause, end_pause
+    if dates is None:
+        dates = get_dates(msgs)
+    deltas = np.diff(dates)
+    if not len(deltas) or deltas.max() <= np.timedelta64(0):
+        return datetime.timedelta(0), msgs[0].date, msgs[0].date
+    i = int(np.argmax(deltas))  # the first one of the longest pauses
+    return msgs[i + 1].date - msgs[i].date, msgs[i].date, msgs[i + 1].date
+
+
+def _get_non_decimal_numerics_class():
+    """Gets a regex character class body of numeric chars which are neither decimal digits nor letters (e.g. "²").
+
+    Notes:
+        Regexes take such chars for word chars, while str.isalpha doesn't.
+    """
+    codes = [ord(ch) for ch in map(chr, range(sys.maxunicode + 1))
+             if ch.isnumeric() and not ch.isdecimal() and not ch.isalpha()]
+    ranges = []
+    for _, group in itertools.groupby(enumerate(codes), key=lambda pair: pair[1] - pair[0]):
+        group = [code for _, code in group]
+        ranges.append(re.escape(chr(group[0])) + (f"-{re.escape(chr(group[-1]))}" if len(group) > 1 else ""))
+    return ''.join(ranges)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_word_re():
+    """Gets a compiled regex of a word: a run of letters (str.isalpha) and apostrophes.
+
+    Notes:
+        It is compiled on the first use, as listing the chars to exclude takes a scan of all the code points.
+    """
+    return re.compile(rf"(?:[^\W\d_{_get_non_decimal_numerics_class()}]+|['`]+)+")
 
 
 def _tokenize(text, stem=False, filters=None):
@@ -423,22 +533,12 @@ def _tokenize(text, stem=False, filters=None):
     # import pymorphy2
     # import pymorphy2_dicts_uk
     # morph = pymorphy2.MorphAnalyzer(lang='uk')
-    i = 0
-    words = []
-    while i < len(text):
-        word = ""
-        while i < len(text) and (text[i].isalpha() or text[i] == '\'' or text[i] == '`'):
-            word += text[i]
-            i += 1
-        if len(word) > 0:
-            if stem or filters is not None:
-                raise NotImplementedError
-                # parsed = morph.parse(word.lower())[0]
-                # if filters is None or any(el in parsed.tag for el in filters):
-                #     words.append(parsed.normal_form)
-            else:
-                words.append(word.lower())
-        i += 1
+    words = [word.lower() for word in _get_word_re().findall(text)]
+    if words and (stem or filters is not None):
+        raise NotImplementedError
+        # parsed = morph.parse(word.lower())[0]
+        # if filters is None or any(el in parsed.tag for el in filters):
+        #     words.append(parsed.normal_form)
     return words
 
 
@@ -455,7 +555,55 @@ def get_words_countered(msgs, stem=False):
     Returns:
         collections.Counter of words.
     """
-    return Counter(itertools.chain.from_iterable(_tokenize(msg.text, stem=stem) for msg in msgs))
+    return count_words([msg.text for msg in msgs], stem=stem)
+
+
+def count_words(texts, stem=False):
+    """Counts all words in texts (see get_words_countered).
+
+    Args:
+        texts (list of strings): Texts.
+        stem (bool): True value means the words will be stemmed (currently out-of-use).
+
+    Returns:
+        collections.Counter of words.
+    """
+    # Words can't span a line break, so all the texts are tokenized at once (the regex treats every char the same
+    # way wherever it is). Only distinct words are lowered, the order of first occurrences is kept.
+    raw_words = Counter(_get_word_re().findall('\n'.join(texts)))
+    if raw_words and stem:
+        raise NotImplementedError
+    words = Counter()
+    for word, num in raw_words.items():
+        words[word.lower()] += num
+    return words
+
+
+def get_words_coded(msgs):
+    """Tokenizes all the messages once and codes their words by integers.
+
+    Notes:
+        Words are coded in order of their first occurrence (the same order Counter keeps them in).
+
+    Args:
+        msgs (list of MyMessage objects): Messages.
+
+    Returns:
+        A tuple such as:
+            (list of words (word's code is its index),
+             numpy int array of codes of all the words in msgs,
+             numpy int array of indices of messages (in msgs) these words are taken from).
+    """
+    vocabulary = dict()
+    codes, msg_indices = [], []
+    for i, msg in enumerate(msgs):
+        for word in _tokenize(msg.text):
+            codes.append(vocabulary.setdefault(word, len(vocabulary)))
+            msg_indices.append(i)
+    return list(vocabulary), np.array(codes, dtype=np.int64), np.array(msg_indices, dtype=np.int64)
+
+
+_emoji_chars = frozenset(e for e in emoji.UNICODE_EMOJI if len(e) == 1)  # texts are checked char by char
 
 
 def get_emoji_countered(msgs):
@@ -467,12 +615,19 @@ def get_emoji_countered(msgs):
     Returns:
         collections.Counter of emojis.
     """
-    cnt = Counter()
-    for msg in msgs:
-        for character in msg.text:
-            if character in emoji.UNICODE_EMOJI:
-                cnt[character] += 1
-    return cnt
+    return count_emojis([msg.text for msg in msgs])
+
+
+def count_emojis(texts):
+    """Counts all emojis in texts.
+
+    Args:
+        texts (list of strings): Texts.
+
+    Returns:
+        collections.Counter of emojis.
+    """
+    return Counter(filter(_emoji_chars.__contains__, ''.join(texts)))
 
 
 def get_messages_lengths_countered(msgs):
@@ -484,4 +639,6 @@ def get_messages_lengths_countered(msgs):
     Returns:
         collections.Counter of messages lengths.
     """
-    return Counter([len(msg.text) for msg in msgs])
+    counts = np.bincount(np.fromiter((len(msg.text) for msg in msgs), dtype=np.int64, count=len(msgs)))
+    lengths = np.flatnonzero(counts)
+    return Counter(dict(zip(lengths.tolist(), counts[lengths].tolist())))